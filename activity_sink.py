@@ -0,0 +1,174 @@
+"""Queue-backed sink for Activity audit rows.
+
+``log_activity()`` hands a plain dict to ``activity_sink.submit()`` and
+returns; a background thread drains the queue and writes the rows with one
+multi-row ``INSERT ... VALUES`` per batch, so request latency no longer
+includes an audit commit.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+
+from sqlalchemy import insert
+
+logger = logging.getLogger(__name__)
+
+DROP = 'drop'
+BLOCK = 'block'
+
+
+class ActivitySink:
+    """Bounded queue plus a writer thread for audit events.
+
+    When the queue is full the overflow policy decides what happens:
+    ``'drop'`` discards the new event right away, ``'block'`` applies
+    backpressure by waiting up to ``ACTIVITY_BLOCK_TIMEOUT`` seconds for room
+    before dropping it.
+    """
+
+    def __init__(self, app=None, db=None, model=None):
+        self.app = None
+        self.db = None
+        self.model = None
+        self.batch_size = 100
+        self.interval = 1.0
+        self.policy = DROP
+        self.block_timeout = 0.5
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+        self._counters = {'queued': 0, 'flushed': 0, 'dropped': 0, 'failed': 0}
+        self._flush_hooks = []
+        if app is not None:
+            self.init_app(app, db, model)
+
+    def init_app(self, app, db, model):
+        app.config.setdefault('ACTIVITY_QUEUE_SIZE', 10000)
+        # Kept small enough that batch_size * columns stays under SQLite's
+        # bound-parameter limit on older builds.
+        app.config.setdefault('ACTIVITY_BATCH_SIZE', 100)
+        app.config.setdefault('ACTIVITY_FLUSH_INTERVAL', 1.0)
+        app.config.setdefault('ACTIVITY_OVERFLOW_POLICY', DROP)
+        app.config.setdefault('ACTIVITY_BLOCK_TIMEOUT', 0.5)
+
+        policy = app.config['ACTIVITY_OVERFLOW_POLICY']
+        if policy not in (DROP, BLOCK):
+            raise ValueError(f'Unknown ACTIVITY_OVERFLOW_POLICY: {policy}')
+
+        self.app = app
+        self.db = db
+        self.model = model
+        self.batch_size = int(app.config['ACTIVITY_BATCH_SIZE'])
+        self.interval = float(app.config['ACTIVITY_FLUSH_INTERVAL'])
+        self.policy = policy
+        self.block_timeout = float(app.config['ACTIVITY_BLOCK_TIMEOUT'])
+        self._queue = queue.Queue(maxsize=int(app.config['ACTIVITY_QUEUE_SIZE']))
+        app.extensions['activity_sink'] = self
+        atexit.register(self.drain)
+
+    def add_flush_hook(self, func):
+        """Call ``func(conn, rows)`` after each batch has been written.
+
+        Hooks run in their own transaction so a failing hook never loses the
+        audit rows themselves.
+        """
+        self._flush_hooks.append(func)
+        return func
+
+    def submit(self, row):
+        """Queue one Activity row (a dict of column values); never raises."""
+        self._ensure_worker()
+        try:
+            if self.policy == BLOCK:
+                self._queue.put(row, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(row)
+        except queue.Full:
+            self._count('dropped')
+            return False
+        self._count('queued')
+        return True
+
+    def flush(self):
+        """Write everything currently queued; returns the number of rows written."""
+        written = 0
+        while True:
+            batch = self._take(self.batch_size)
+            if not batch:
+                return written
+            written += self._write(batch)
+
+    def drain(self):
+        """Stop the writer thread and flush what is left (used at exit)."""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive() and self._pid == os.getpid():
+            thread.join(timeout=max(self.interval * 2, 1.0))
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+        counters['pending'] = self._queue.qsize()
+        return counters
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def _take(self, limit, timeout=None):
+        batch = []
+        try:
+            if timeout is not None:
+                batch.append(self._queue.get(timeout=timeout))
+            while len(batch) < limit:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _write(self, batch):
+        try:
+            with self.app.app_context():
+                with self.db.engine.begin() as conn:
+                    conn.execute(insert(self.model.__table__).values(batch))
+        except Exception:
+            logger.exception('Failed to write %d activity rows', len(batch))
+            self._count('failed', len(batch))
+            return 0
+        self._count('flushed', len(batch))
+        self._run_hooks(batch)
+        return len(batch)
+
+    def _run_hooks(self, batch):
+        if not self._flush_hooks:
+            return
+        try:
+            with self.app.app_context():
+                with self.db.engine.begin() as conn:
+                    for hook in self._flush_hooks:
+                        hook(conn, batch)
+        except Exception:
+            logger.exception('Activity flush hook failed')
+
+    def _ensure_worker(self):
+        # Started lazily and per-pid so forked gunicorn workers get their own thread.
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, name='activity-sink', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._take(self.batch_size, timeout=self.interval)
+            if batch:
+                self._write(batch)
@@ -0,0 +1,582 @@
+"""Admin pages: login, dashboard and chapter/slide management."""
+import json
+import shutil
+import tempfile
+from datetime import datetime
+
+from flask import Blueprint, current_app, flash, jsonify, redirect, render_template, request, url_for
+from flask_login import current_user, login_required, login_user, logout_user
+from werkzeug.wsgi import get_input_stream
+
+from auth import admin_required, super_admin_required
+from extensions import content_versions, db, slide_search
+from i18n import pick_lang
+from media import release_slide_image, slide_image_variants
+from models import SLIDE_ORDER, Activity, Chapter, Slide, User
+from pagination import decode_cursor, keyset_page
+from slide_import import ManifestError, import_archive
+from stats import enhance_chapters, log_activity
+
+bp = Blueprint('admin', __name__)
+
+
+def bump_slide_versions(slide):
+    """Invalidate cached pages that show ``slide`` (its page, its chapter, and chapter listings);
+    call before committing the edit"""
+    content_versions.bump('slides', f'chapter-{slide.chapter_id}', f'slide-{slide.id}')
+
+
+@bp.route('/<lang>/admin/login', methods=['GET', 'POST'])
+def admin_login(lang):
+    if current_user.is_authenticated:
+        return redirect(url_for('admin.admin_dashboard', lang=lang))
+
+    lang, t, lang_code = pick_lang(lang)
+
+    if request.method == 'POST':
+        username = request.form['username']
+        password = request.form['password']
+        user = User.query.filter_by(username=username, is_active=True).first()
+
+        if user and user.check_password(password):
+            login_user(user)
+            user.last_login = datetime.utcnow()
+            try:
+                db.session.commit()
+                log_activity('login', 'user', user.id, f'User {username} logged in')
+            except:
+                db.session.rollback()
+
+            flash(t['login_success'], 'success')
+            return redirect(url_for('admin.admin_dashboard', lang=lang))
+
+        flash(t['invalid_credentials'], 'error')
+
+    return render_template('admin_login.html', t=t, lang=lang, lang_code=lang_code)
+
+
+@bp.route('/<lang>/admin/logout')
+@login_required
+def admin_logout(lang):
+    lang, t, lang_code = pick_lang(lang)
+    if current_user.is_authenticated:
+        log_activity('logout', 'user', current_user.id, f'User {current_user.username} logged out')
+    logout_user()
+    flash(t['logout_success'], 'info')
+    return redirect(url_for('public.index', lang=lang))
+
+
+@bp.route('/<lang>/admin/dashboard')
+@login_required
+def admin_dashboard(lang):
+    """Admin dashboard - all data from database"""
+    lang, t, lang_code = pick_lang(lang)
+
+    if current_user.is_super_admin:
+        chapters = Chapter.query.filter_by(is_active=True).order_by(Chapter.order).all()
+        total_slides = Slide.query.filter_by(is_active=True).count()
+        total_users = User.query.filter_by(is_active=True).count()
+    else:
+        if current_user.chapter_id:
+            chapters = [Chapter.query.get(current_user.chapter_id)]
+            total_slides = Slide.query.filter_by(
+                chapter_id=current_user.chapter_id, is_active=True
+            ).count()
+        else:
+            chapters = []
+            total_slides = 0
+        total_users = 1
+
+    if current_user.is_super_admin:
+        recent_activities = Activity.query.order_by(Activity.created_at.desc()).limit(10).all()
+    else:
+        recent_activities = Activity.query.filter_by(
+            user_id=current_user.id
+        ).order_by(Activity.created_at.desc()).limit(10).all()
+
+    chapters = [chapter for chapter in chapters if chapter]
+    enhanced_chapters = enhance_chapters(chapters)
+    total_views = sum(item['total_views'] for item in enhanced_chapters)
+    recent_activity_count = len(recent_activities)
+    activity_percentage = min(85 + (recent_activity_count * 2), 100)
+
+    stats = {
+        'total_chapters': len(chapters),
+        'total_slides': total_slides,
+        'total_users': total_users,
+        'activity_percentage': activity_percentage,
+        'total_views': total_views,
+        'recent_activities_count': recent_activity_count
+    }
+
+    return render_template('admin_dashboard.html', chapters=enhanced_chapters, stats=stats,
+                           recent_activities=recent_activities, t=t, lang=lang, lang_code=lang_code)
+
+
+@bp.route('/<lang>/admin/chapters')
+@admin_required
+def manage_chapters(lang):
+    """Chapter management page - data from database"""
+    lang, t, lang_code = pick_lang(lang)
+
+    if current_user.is_super_admin:
+        chapters = Chapter.query.filter_by(is_active=True).order_by(Chapter.order).all()
+    else:
+        chapters = [current_user.chapter] if current_user.chapter else []
+
+    enhanced_chapters = enhance_chapters(chapters)
+
+    return render_template('manage_chapters.html', chapters=enhanced_chapters,
+                           t=t, lang=lang, lang_code=lang_code)
+
+
+@bp.route('/<lang>/admin/chapter/add', methods=['GET', 'POST'])
+@super_admin_required
+def add_chapter(lang):
+    """Add new chapter - only super admins"""
+    lang, t, lang_code = pick_lang(lang)
+
+    if request.method == 'POST':
+        # Lock the chapter rows, as reorder_chapter does, so a concurrent add
+        # waits for this one and its INSERT then reads the new max(order); on an
+        # empty table there is nothing to lock and the unique order is the backstop
+        db.session.execute(db.select(Chapter.id).with_for_update()).all()
+        next_order = db.select(db.func.coalesce(db.func.max(Chapter.order), 0) + 1).scalar_subquery()
+        chapter = Chapter(
+            title_en=request.form.get('title_en', ''),
+            title_ckb=request.form.get('title_ckb', ''),
+            description_en=request.form.get('description_en', ''),
+            description_ckb=request.form.get('description_ckb', ''),
+            order=next_order,
+            icon=request.form.get('icon', 'fas fa-book')
+        )
+
+        db.session.add(chapter)
+        try:
+            content_versions.bump('chapters')
+            db.session.commit()
+            log_activity('create', 'chapter', chapter.id, f'Added chapter: {chapter.title_en}')
+
+            if request.headers.get('Content-Type') == 'application/json' or request.is_json:
+                return jsonify({'success': True, 'message': t['success_added'], 'chapter_id': chapter.id})
+            else:
+                flash(t['success_added'], 'success')
+                return redirect(url_for('admin.manage_chapters', lang=lang))
+
+        except Exception as e:
+            db.session.rollback()
+            if request.headers.get('Content-Type') == 'application/json' or request.is_json:
+                return jsonify({'success': False, 'message': t['error_occurred']})
+            else:
+                flash(t['error_occurred'], 'error')
+
+    return render_template('add_chapter.html', t=t, lang=lang, lang_code=lang_code)
+
+
+@bp.route('/<lang>/admin/chapter/<int:chapter_id>/edit', methods=['GET', 'POST'])
+@admin_required
+def edit_chapter(lang, chapter_id):
+    """Edit chapter - data from database"""
+    lang, t, lang_code = pick_lang(lang)
+    chapter = Chapter.query.get_or_404(chapter_id)
+
+    if current_user.role == 'chapter_admin' and current_user.chapter_id != chapter_id:
+        flash('No permission to edit this chapter', 'error')
+        return redirect(url_for('admin.admin_dashboard', lang=lang))
+
+    if request.method == 'POST':
+        chapter.title_en = request.form.get('title_en', chapter.title_en)
+        chapter.title_ckb = request.form.get('title_ckb', chapter.title_ckb)
+        chapter.description_en = request.form.get('description_en', chapter.description_en)
+        chapter.description_ckb = request.form.get('description_ckb', chapter.description_ckb)
+        chapter.icon = request.form.get('icon', chapter.icon)
+
+        if current_user.is_super_admin:
+            new_order = request.form.get('order')
+            if new_order and new_order.isdigit():
+                chapter.order = int(new_order)
+
+        chapter.updated_at = datetime.utcnow()
+
+        try:
+            content_versions.bump('chapters')
+            db.session.commit()
+            log_activity('edit', 'chapter', chapter.id, f'Updated chapter: {chapter.title_en}')
+            flash(t['success_updated'], 'success')
+            return redirect(url_for('admin.manage_chapters', lang=lang))
+        except Exception as e:
+            db.session.rollback()
+            flash(t['error_occurred'], 'error')
+
+    return render_template('edit_chapter.html', chapter=chapter, t=t, lang=lang, lang_code=lang_code)
+
+
+@bp.route('/<lang>/admin/chapter/<int:chapter_id>/delete', methods=['POST'])
+@super_admin_required
+def delete_chapter(lang, chapter_id):
+    """Delete chapter from database (soft delete)"""
+    chapter = Chapter.query.get_or_404(chapter_id)
+    chapter_title = chapter.title_en
+
+    try:
+        # Soft delete - set is_active to False
+        chapter.is_active = False
+        chapter.updated_at = datetime.utcnow()
+
+        # Also deactivate all slides in this chapter
+        slides = Slide.query.filter_by(chapter_id=chapter_id).all()
+        for slide in slides:
+            slide.is_active = False
+            slide.updated_at = datetime.utcnow()
+
+        content_versions.bump('chapters')
+        db.session.commit()
+        log_activity('delete', 'chapter', chapter_id, f'Deleted chapter: {chapter_title}')
+
+        return jsonify({'success': True, 'message': 'Chapter deleted successfully'})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': 'Error deleting chapter'})
+
+
+@bp.route('/<lang>/admin/chapter/<int:chapter_id>/slides')
+@admin_required
+def manage_slides(lang, chapter_id):
+    """Manage slides - data from database"""
+    lang, t, lang_code = pick_lang(lang)
+
+    if current_user.role == 'chapter_admin' and current_user.chapter_id != chapter_id:
+        flash('No permission to manage this chapter', 'error')
+        return redirect(url_for('admin.admin_dashboard', lang=lang))
+
+    chapter = Chapter.query.get_or_404(chapter_id)
+    query = Slide.query.filter_by(chapter_id=chapter_id, is_active=True)
+    page = keyset_page(query, SLIDE_ORDER, current_app.config['ADMIN_SLIDES_PER_PAGE'],
+                       after=decode_cursor(request.args.get('after'), SLIDE_ORDER),
+                       before=decode_cursor(request.args.get('before'), SLIDE_ORDER))
+    slides_count = query.count()
+
+    # Fix: Add extra attributes to slide objects directly
+    enhanced_slides = []
+    for slide in page.items:
+        # Add extra attributes to the slide object
+        slide.extra_views = slide.view_count  # In case you want to display separately
+        slide.last_updated_formatted = slide.updated_at
+        enhanced_slides.append(slide)
+
+    return render_template('manage_slides.html', chapter=chapter, slides=enhanced_slides,
+                           slides_count=slides_count, page=page, t=t, lang=lang, lang_code=lang_code)
+
+
+# FIXED: Updated add_slide route to properly handle dynamic sections
+@bp.route('/<lang>/admin/slide/add', methods=['GET', 'POST'])
+@admin_required
+def add_slide(lang):
+    """Add new slide with dynamic sections and image cropping - FIXED VERSION"""
+    lang, t, lang_code = pick_lang(lang)
+
+    if request.method == 'POST':
+        try:
+            # Log all form data for debugging
+            current_app.logger.info(f"Form data received: {dict(request.form)}")
+
+            chapter_id_str = request.form.get('chapter_id', '')
+            if not chapter_id_str:
+                return jsonify({'success': False, 'message': 'Chapter selection is required.'})
+
+            chapter_id = int(chapter_id_str)
+
+            # Check permissions
+            if current_user.role == 'chapter_admin' and current_user.chapter_id != chapter_id:
+                return jsonify({'success': False, 'message': 'No permission to add slides to this chapter'})
+
+            # Next position in this chapter, computed inside the INSERT; the lock on
+            # the chapter row makes a concurrent add wait and then see this slide
+            db.session.execute(db.select(Chapter.id).where(Chapter.id == chapter_id).with_for_update()).all()
+            next_order = (db.select(db.func.coalesce(db.func.max(Slide.order), 0) + 1)
+                          .where(Slide.chapter_id == chapter_id).scalar_subquery())
+
+            # Parse dynamic sections - FIXED PARSING
+            sections_data_str = request.form.get('sections_data', '')
+            dynamic_sections = []
+
+            if sections_data_str:
+                try:
+                    parsed_sections = json.loads(sections_data_str)
+
+                    # Process each section
+                    for section in parsed_sections:
+                        if isinstance(section, dict) and section.get('name'):
+                            clean_section = {
+                                'name': section['name'].strip(),
+                                'bullets': [bullet.strip() for bullet in section.get('bullets', []) if bullet.strip()]
+                            }
+
+                            if clean_section['name'] or clean_section['bullets']:
+                                dynamic_sections.append(clean_section)
+                    current_app.logger.info(f"Processed dynamic sections: {dynamic_sections}")
+
+                except json.JSONDecodeError as e:
+                    current_app.logger.error(f"JSON decode error: {e}")
+                    current_app.logger.error(f"Raw sections data: {sections_data_str}")
+                except Exception as e:
+                    current_app.logger.error(f"Error processing sections: {e}")
+
+            # Create new slide
+            slide = Slide(
+                title_en=request.form.get('title_en', '').strip(),
+                title_ckb=request.form.get('title_ckb', '').strip(),
+                content_en=request.form.get('content_en', '').strip(),
+                content_ckb=request.form.get('content_ckb', '').strip(),
+                order=next_order,
+                chapter_id=chapter_id,
+                image_url=request.form.get('image_url', '').strip(),
+                image_filename=request.form.get('image_filename', '').strip(),
+                thumbnail_filename=request.form.get('thumbnail_filename', '').strip()
+            )
+
+            if slide.image_filename:
+                slide.image_variants = slide_image_variants(slide.image_filename)
+
+            # Set dynamic sections - FIXED
+            if dynamic_sections:
+                slide.set_dynamic_sections(dynamic_sections)
+                current_app.logger.info(f"Set dynamic sections for slide: {dynamic_sections}")
+
+            # Save to database
+            db.session.add(slide)
+            db.session.flush()
+            bump_slide_versions(slide)
+            db.session.commit()
+            slide_search.index(slide)
+
+            # Log the activity
+            log_activity('create', 'slide', slide.id, f'Added slide: {slide.title_en}')
+
+            current_app.logger.info(f"Successfully created slide with ID: {slide.id}")
+
+            return jsonify({
+                'success': True,
+                'message': 'سلایدەکە بە سەرکەوتووی زیادکرا',
+                'chapter_id': chapter_id,
+                'slide_id': slide.id
+            })
+
+        except ValueError as e:
+            current_app.logger.error(f"ValueError in add_slide: {e}")
+            return jsonify({'success': False, 'message': 'Invalid chapter ID'})
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Error adding slide: {str(e)}")
+            return jsonify({
+                'success': False,
+                'message': f"هەڵەیەک ڕوویدا: {str(e)}"
+            }), 500
+
+    # GET request handling
+    if current_user.is_super_admin:
+        chapters = Chapter.query.filter_by(is_active=True).order_by(Chapter.order).all()
+    else:
+        chapters = [current_user.chapter] if current_user.chapter else []
+
+    return render_template('add_slide_enhanced.html', chapters=chapters, t=t, lang=lang, lang_code=lang_code)
+
+
+@bp.route('/<lang>/admin/slides/import', methods=['POST'])
+@admin_required
+def import_slides(lang):
+    """Create slides in bulk from a ZIP of images and a manifest sent as the request body
+    (``Content-Type: application/zip``); see slide_import.py for the format"""
+    lang, t, lang_code = pick_lang(lang)
+    chapter_ids = [current_user.chapter_id] if current_user.role == 'chapter_admin' else None
+
+    # Archives are far larger than MAX_CONTENT_LENGTH, so the body is not parsed as a
+    # form but copied to a temporary file in chunks, under its own size limit
+    stream = get_input_stream(request.environ, max_content_length=current_app.config['SLIDE_IMPORT_MAX_SIZE'])
+    with tempfile.TemporaryFile() as archive_file:
+        shutil.copyfileobj(stream, archive_file, 1024 * 1024)
+        try:
+            report = import_archive(archive_file,
+                                    chapter_id=request.args.get('chapter_id', type=int) or current_user.chapter_id,
+                                    chapter_ids=chapter_ids, strict=request.args.get('strict') == '1',
+                                    user_id=current_user.id)
+        except ManifestError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+
+    for chapter_id, count in report['chapters'].items():
+        log_activity('import', 'chapter', chapter_id, f'Imported {count} slides')
+    # 202 while the images are still being processed; poll the job ids for their status
+    return jsonify(dict(report, success=not report['errors'],
+                        message=f"Imported {report['imported']} of {report['rows']} slides")), \
+        202 if report['job_ids'] else 200
+
+
+@bp.route('/<lang>/admin/slide/<int:slide_id>/edit', methods=['GET', 'POST'])
+@admin_required
+def edit_slide(lang, slide_id):
+    """Edit slide with dynamic sections and image upload support"""
+    lang, t, lang_code = pick_lang(lang)
+    slide = Slide.query.get_or_404(slide_id)
+
+    if current_user.role == 'chapter_admin' and current_user.chapter_id != slide.chapter_id:
+        flash('No permission to edit this slide', 'error')
+        return redirect(url_for('admin.admin_dashboard', lang=lang))
+
+    if request.method == 'POST':
+        try:
+            # Handle old image cleanup if new image is uploaded
+            old_image_filename = slide.image_filename
+            old_thumbnail_filename = slide.thumbnail_filename
+
+            # Update basic fields
+            slide.title_en = request.form.get('title_en', '').strip()
+            slide.title_ckb = request.form.get('title_ckb', '').strip()
+            slide.content_en = request.form.get('content_en', '').strip()
+            slide.content_ckb = request.form.get('content_ckb', '').strip()
+            slide.order = int(request.form.get('order', slide.order))
+            slide.image_url = request.form.get('image_url', '').strip()
+
+            # Handle uploaded image
+            new_image_filename = request.form.get('image_filename', '').strip()
+            new_thumbnail_filename = request.form.get('thumbnail_filename', '').strip()
+
+            if new_image_filename and new_image_filename != old_image_filename:
+                slide.image_filename = new_image_filename
+                slide.thumbnail_filename = new_thumbnail_filename
+                slide.image_variants = slide_image_variants(new_image_filename)
+
+            # Handle dynamic sections - This is the FIXED part
+            sections_data_str = request.form.get('sections_data', '').strip()
+            print(f"Received sections_data: {sections_data_str}")  # Debug log
+
+            if sections_data_str:
+                try:
+                    sections_data = json.loads(sections_data_str)
+                    print(f"Parsed sections_data: {sections_data}")  # Debug log
+
+                    # Clean up sections data - remove empty bullets
+                    cleaned_sections = []
+                    for section in sections_data:
+                        section_name = section.get('name', '').strip()
+                        section_bullets = section.get('bullets', [])
+
+                        # Filter out empty bullets
+                        cleaned_bullets = [bullet.strip() for bullet in section_bullets if bullet.strip()]
+
+                        # Only add section if it has name or bullets
+                        if section_name or cleaned_bullets:
+                            cleaned_section = {
+                                'name': section_name,
+                                'bullets': cleaned_bullets
+                            }
+                            cleaned_sections.append(cleaned_section)
+
+                    print(f"Cleaned sections: {cleaned_sections}")  # Debug log
+                    slide.set_dynamic_sections(cleaned_sections)
+
+                except json.JSONDecodeError as e:
+                    print(f"JSON decode error: {e}")  # Debug log
+                    flash('Error parsing sections data', 'error')
+            else:
+                print("No sections data received, setting empty")  # Debug log
+                slide.set_dynamic_sections([])
+
+            slide.updated_at = datetime.utcnow()
+
+            bump_slide_versions(slide)
+            db.session.commit()
+            slide_search.index(slide)
+
+            # Clean up the old files unless another slide shares them
+            if slide.image_filename != old_image_filename:
+                try:
+                    release_slide_image(old_image_filename, old_thumbnail_filename)
+                except Exception as e:
+                    current_app.logger.error(f"Error removing old slide image: {e}")
+
+            log_activity('edit', 'slide', slide.id, f'Updated slide: {slide.title_en}')
+            flash(t['success_updated'], 'success')
+            return redirect(url_for('admin.manage_slides', lang=lang, chapter_id=slide.chapter_id))
+
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Error updating slide: {str(e)}")
+            print(f"Exception in edit_slide: {str(e)}")  # Debug log
+            flash(t['error_occurred'], 'error')
+
+    return render_template('edit_slide_enhanced.html', slide=slide, t=t, lang=lang, lang_code=lang_code)
+
+
+@bp.route('/<lang>/admin/slide/<int:slide_id>/delete', methods=['POST'])
+@admin_required
+def delete_slide(lang, slide_id):
+    """Delete slide from database"""
+    slide = Slide.query.get_or_404(slide_id)
+
+    if current_user.role == 'chapter_admin' and current_user.chapter_id != slide.chapter_id:
+        return jsonify({'success': False, 'message': 'No permission to delete this slide'})
+
+    slide_title = slide.title_en
+
+    try:
+        slide.is_active = False
+        slide.updated_at = datetime.utcnow()
+        bump_slide_versions(slide)
+        db.session.commit()
+        slide_search.remove(slide_id)
+        log_activity('delete', 'slide', slide_id, f'Deleted slide: {slide_title}')
+
+        return jsonify({'success': True, 'message': 'Slide deleted successfully'})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': 'Error deleting slide'})
+
+
+@bp.route('/<lang>/admin/chapter/<int:chapter_id>/reorder', methods=['POST'])
+@super_admin_required
+def reorder_chapter(lang, chapter_id):
+    """Reorder chapter"""
+    data = request.get_json()
+    new_order = data.get('new_order')
+
+    if not new_order or not isinstance(new_order, int):
+        return jsonify({'success': False, 'message': 'Invalid order'})
+
+    table = Chapter.__table__
+    try:
+        # Lock the chapter rows so concurrent reorders run one after the other
+        # (FOR UPDATE is not rendered on SQLite, where writers are serialized anyway)
+        orders = dict(db.session.execute(db.select(table.c.id, table.c.order).with_for_update()).all())
+        if chapter_id not in orders:
+            return jsonify({'success': False, 'message': 'Chapter not found'})
+        old_order = orders[chapter_id]
+
+        if old_order < new_order:
+            # Moving down: the chapters between old and new positions move up one
+            in_between = db.and_(table.c.order > old_order, table.c.order <= new_order)
+            shift = -1
+        else:
+            # Moving up: the chapters between new and old positions move down one
+            in_between = db.and_(table.c.order >= new_order, table.c.order < old_order)
+            shift = 1
+
+        # "order" is unique, so park every moved row on its negated target first and
+        # flip the signs back in one statement; no two rows ever share a value.
+        # Inactive chapters in the range move too, otherwise they would collide.
+        db.session.execute(db.update(table)
+                           .where(in_between, table.c.id != chapter_id)
+                           .values(order=-(table.c.order + shift)))
+        db.session.execute(db.update(table)
+                           .where(table.c.id == chapter_id)
+                           .values(order=-new_order, updated_at=datetime.utcnow()))
+        db.session.execute(db.update(table).where(table.c.order < 0).values(order=-table.c.order))
+
+        content_versions.bump('chapters')
+        db.session.commit()
+        log_activity('reorder', 'chapter', chapter_id, f'Reordered chapter to position {new_order}')
+
+        return jsonify({'success': True, 'message': 'Order updated successfully'})
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': 'Error updating order'})
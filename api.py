@@ -0,0 +1,149 @@
+"""JSON endpoints used by the search box, chapter scrolling, offline chapters and the admin dashboard."""
+import time
+from datetime import datetime
+
+from flask import Blueprint, current_app, jsonify, render_template, request, url_for
+from flask_login import current_user
+
+from auth import admin_required
+from extensions import activity_sink, db
+from i18n import pick_lang
+from models import SLIDE_ORDER, Activity, Chapter, Slide, User
+from offline import chapter_bundle
+from public import chapter_slides_page, search_hits
+from stats import get_chapter_stats
+
+bp = Blueprint('api', __name__)
+
+
+@bp.route("/api/<lang>/search")
+def search_api(lang):
+    """JSON search: ranked hits with highlighted snippets"""
+    lang, t, lang_code = pick_lang(lang)
+    query = request.args.get('q', '').strip()
+    limit = request.args.get('limit', type=int)
+    started = time.perf_counter()
+    hits = search_hits(query, lang, limit) if query else []
+    return jsonify({
+        'success': True,
+        'query': query,
+        'took_ms': round((time.perf_counter() - started) * 1000, 2),
+        'results': [dict(hit, snippet=str(hit['snippet'])) for hit in hits]
+    })
+
+
+@bp.route('/api/<lang>/chapter/<int:chapter_id>/slides')
+@bp.route('/api/<lang>/chapter/<int:chapter_id>/slides/<cursor>.json')
+def chapter_slides_api(lang, chapter_id, cursor=None):
+    """A page of a chapter's slides for infinite scroll: the data, the rendered
+    grid and list entries, and the cursor of the next page (null on the last).
+
+    ``slides/<cursor>.json`` pages have the default size and are what the
+    chapter page fetches, so the static export can write them as files;
+    ``next_url`` and ``next_page_url`` are the API and HTML URLs of the next page.
+    """
+    lang, t, lang_code = pick_lang(lang)
+    if not db.session.query(Chapter.id).filter_by(id=chapter_id, is_active=True).scalar():
+        return jsonify({'success': False, 'message': 'Chapter not found'}), 404
+
+    limit = current_app.config['SLIDES_PER_PAGE']
+    if cursor is None:
+        cursor = request.args.get('after')
+        limit = max(1, min(request.args.get('limit', limit, type=int), 100))
+    page, first_number = chapter_slides_page(chapter_id, cursor, limit)
+    next_cursor = page.next_cursor
+    return jsonify({
+        'success': True,
+        'next': next_cursor,
+        'next_url': next_cursor and url_for('api.chapter_slides_api', lang=lang_code, chapter_id=chapter_id,
+                                            cursor=next_cursor),
+        'next_page_url': next_cursor and url_for('public.chapter', lang=lang_code, chapter_id=chapter_id,
+                                                 cursor=next_cursor),
+        'slides': [{
+            'id': slide.id,
+            'number': number,
+            'title': slide.get_title(lang_code),
+            'url': url_for('public.slide_detail', lang=lang_code, slide_id=slide.id),
+            'thumbnail_url': slide.get_thumbnail_url(),
+            'view_count': slide.view_count,
+        } for number, slide in enumerate(page.items, first_number)],
+        'grid_html': render_template('chapter/slide_grid.html', slides=page.items, first_number=first_number),
+        'list_html': render_template('chapter/slide_list.html', slides=page.items, first_number=first_number),
+    })
+
+
+@bp.route('/api/<lang>/chapter/<int:chapter_id>/offline.json')
+def chapter_offline_bundle(lang, chapter_id):
+    """URLs and revisions of everything needed to read a chapter offline"""
+    lang, t, lang_code = pick_lang(lang)
+    chapter = Chapter.query.filter_by(id=chapter_id, is_active=True).first_or_404()
+    slides = Slide.query.filter_by(chapter_id=chapter_id, is_active=True).order_by(*SLIDE_ORDER).all()
+    response = jsonify(chapter_bundle(chapter, slides, lang_code))
+    # Revisions also change with a new release, which the content versions don't cover
+    response.cache_control.no_store = True
+    return response
+
+
+@bp.route('/api/<lang>/chapter/<int:chapter_id>')
+@admin_required
+def get_chapter_api(lang, chapter_id):
+    """API endpoint to get chapter data"""
+    chapter = Chapter.query.get_or_404(chapter_id)
+
+    if current_user.role == 'chapter_admin' and current_user.chapter_id != chapter_id:
+        return jsonify({'success': False, 'message': 'No permission'})
+
+    return jsonify({
+        'success': True,
+        'chapter': {
+            'id': chapter.id,
+            'title_en': chapter.title_en,
+            'title_ckb': chapter.title_ckb,
+            'description_en': chapter.description_en,
+            'description_ckb': chapter.description_ckb,
+            'icon': chapter.icon,
+            'order': chapter.order
+        }
+    })
+
+
+@bp.route('/api/<lang>/dashboard/stats')
+@admin_required
+def dashboard_stats_api(lang):
+    """API endpoint for real-time dashboard statistics"""
+    if current_user.is_super_admin:
+        total_chapters = Chapter.query.filter_by(is_active=True).count()
+        total_slides = Slide.query.filter_by(is_active=True).count()
+        total_users = User.query.filter_by(is_active=True).count()
+        total_views = (db.session.query(db.func.sum(Chapter.view_count)).scalar() or 0) + \
+                      sum(views for _, views in get_chapter_stats().values())
+    else:
+        if current_user.chapter_id:
+            total_chapters = 1
+            total_slides = Slide.query.filter_by(
+                chapter_id=current_user.chapter_id, is_active=True
+            ).count()
+            chapter_views = Chapter.query.get(current_user.chapter_id).view_count or 0
+            _, slide_views = get_chapter_stats([current_user.chapter_id]).get(current_user.chapter_id, (0, 0))
+            total_views = chapter_views + slide_views
+        else:
+            total_chapters = total_slides = total_views = 0
+        total_users = 1
+
+    recent_activities = Activity.query.filter(
+        Activity.created_at >= datetime.utcnow().replace(hour=0, minute=0, second=0)
+    ).count()
+    activity_percentage = min(85 + recent_activities, 100)
+
+    data = {
+        'total_chapters': total_chapters,
+        'total_slides': total_slides,
+        'total_users': total_users,
+        'total_views': total_views,
+        'activity_percentage': activity_percentage
+    }
+    if current_user.is_super_admin:
+        # queued / flushed / dropped / failed / pending audit events
+        data['activity_log'] = activity_sink.stats()
+
+    return jsonify(data)
@@ -0,0 +1,92 @@
+"""Content fingerprints for files served from ``static/`` and the uploads folder.
+
+Every ``url_for('static', ...)`` and ``url_for('uploaded_file', ...)`` gets a
+``?v=<hash of the file>`` argument added through a URL defaults callback, so
+templates and ``Slide.get_image_url()`` pick it up without changes.  A
+request whose ``v`` matches the file's current hash is answered with a
+far-future immutable ``Cache-Control``; a changed file gets a new URL.
+Names the ``fingerprinted`` callable accepts (content-addressed uploads)
+already change with their content and are cached the same way without a
+``v`` argument.
+"""
+import hashlib
+import os
+import threading
+
+from flask import request
+
+
+class AssetManifest:
+    def __init__(self, app=None, roots=None, fingerprinted=None):
+        self.enabled = True
+        self.max_age = 31536000
+        self.roots = {}
+        self.fingerprinted = fingerprinted
+        self._lock = threading.Lock()
+        self._entries = {}
+        if app is not None:
+            self.init_app(app, roots, fingerprinted)
+
+    def init_app(self, app, roots, fingerprinted=None):
+        """``roots`` maps an endpoint to the folder its ``filename`` lives in."""
+        app.config.setdefault('ASSET_FINGERPRINTING', True)
+        app.config.setdefault('ASSET_MAX_AGE', 31536000)
+        self.enabled = app.config['ASSET_FINGERPRINTING']
+        self.max_age = int(app.config['ASSET_MAX_AGE'])
+        self.roots = {endpoint: os.path.join(app.root_path, folder) for endpoint, folder in roots.items()}
+        if fingerprinted is not None:
+            self.fingerprinted = fingerprinted
+        app.url_defaults(self._add_fingerprint)
+        app.after_request(self._cache_headers)
+        app.extensions['asset_manifest'] = self
+
+    def fingerprint(self, endpoint, filename):
+        """Short content hash of ``filename`` under ``endpoint``'s folder, or None."""
+        root = self.roots.get(endpoint)
+        if root is None or not filename:
+            return None
+        path = os.path.normpath(os.path.join(root, filename))
+        if not path.startswith(os.path.normpath(root) + os.sep):
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+
+        # Re-hash only when the file changed on disk
+        key = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            entry = self._entries.get(path)
+        if entry is not None and entry[0] == key:
+            return entry[1]
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(64 * 1024), b''):
+                digest.update(chunk)
+        value = digest.hexdigest()[:12]
+        with self._lock:
+            self._entries[path] = (key, value)
+        return value
+
+    def _add_fingerprint(self, endpoint, values):
+        if not self.enabled or endpoint not in self.roots or 'v' in values:
+            return
+        if self.fingerprinted and self.fingerprinted(values.get('filename') or ''):
+            return
+        fingerprint = self.fingerprint(endpoint, values.get('filename'))
+        if fingerprint:
+            values['v'] = fingerprint
+
+    def _cache_headers(self, response):
+        if not self.enabled or request.endpoint not in self.roots or response.status_code != 200:
+            return response
+        filename = (request.view_args or {}).get('filename') or ''
+        version = request.args.get('v')
+        if (self.fingerprinted and self.fingerprinted(filename)) or \
+                (version and version == self.fingerprint(request.endpoint, filename)):
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = self.max_age
+            response.cache_control.immutable = True
+        return response
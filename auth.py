@@ -1,18 +1,21 @@
-from flask_login import LoginManager
 from functools import wraps
+
+from flask import flash, redirect, url_for
 from flask_login import current_user
-from flask import redirect, url_for, request, flash
 
-login_manager = LoginManager()
+from extensions import db, login_manager
+from models import User
 
 
-def login_required(f):
+def super_admin_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if not current_user.is_authenticated:
-            lang = kwargs.get('lang', 'en')
-            flash('تکایە سەرەتا چووە ژوورەوە', 'warning')
-            return redirect(url_for('admin_login', lang=lang))
+            flash("You must be logged in to access this page.", "warning")
+            return redirect(url_for("admin.admin_login", lang=kwargs.get('lang', 'en')))
+        if not current_user.is_super_admin:
+            flash("Only super admins can access this page.", "danger")
+            return redirect(url_for("admin.admin_dashboard", lang=kwargs.get('lang', 'en')))
         return f(*args, **kwargs)
 
     return decorated_function
@@ -22,33 +25,16 @@ def admin_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if not current_user.is_authenticated:
-            lang = kwargs.get('lang', 'en')
-            flash('تکایە سەرەتا چووە ژوورەوە', 'warning')
-            return redirect(url_for('admin_login', lang=lang))
-
-        if current_user.role not in ['super_admin', 'chapter_admin']:
-            lang = kwargs.get('lang', 'en')
-            flash('دەسەڵاتت نییە بۆ ئەم کردارە', 'error')
-            return redirect(url_for('index', lang=lang))
-
+            flash("You must be logged in to access this page.", "warning")
+            return redirect(url_for("admin.admin_login", lang=kwargs.get('lang', 'en')))
+        if not current_user.is_admin:
+            flash("You do not have permission to access this page.", "danger")
+            return redirect(url_for("admin.admin_dashboard", lang=kwargs.get('lang', 'en')))
         return f(*args, **kwargs)
 
     return decorated_function
 
 
-def super_admin_required(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if not current_user.is_authenticated:
-            lang = kwargs.get('lang', 'en')
-            flash('تکایە سەرەتا چووە ژوورەوە', 'warning')
-            return redirect(url_for('admin_login', lang=lang))
-
-        if current_user.role != 'super_admin':
-            lang = kwargs.get('lang', 'en')
-            flash('تەنها بەڕێوەبەری گشتی دەتوانێ ئەم کردارە ئەنجام بدات', 'error')
-            return redirect(url_for('admin_dashboard', lang=lang))
-
-        return f(*args, **kwargs)
-
-    return decorated_function
\ No newline at end of file
+@login_manager.user_loader
+def load_user(user_id):
+    return db.session.get(User, int(user_id))
@@ -0,0 +1,149 @@
+"""UI string catalogs for the site languages.
+
+Translators edit ``translations/<lang>.json`` (a ``language`` block with the
+switcher label and text direction, and the ``strings`` themselves).
+``flask i18n-compile`` turns each source into a gettext ``.mo`` file, with
+strings the language lacks filled in from the default language, so nothing
+falls back at request time.  Every worker reads the ``.mo`` files once at
+startup into read-only mappings; with ``gunicorn --preload`` they are loaded
+before the fork and shared by all workers.  Adding a language is adding a
+JSON file and compiling it.
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+from types import MappingProxyType
+
+MO_MAGIC = 0x950412de
+
+
+class Catalog:
+    """Strings and display settings of one language"""
+    __slots__ = ('code', 'name', 'direction', 'strings')
+
+    def __init__(self, code, name, direction, strings):
+        self.code = code
+        self.name = name
+        self.direction = direction
+        self.strings = MappingProxyType(strings)
+
+
+def source_digest(directory, code, default):
+    """Digest of the JSON a compiled catalog is built from (its own and the default language's)"""
+    digest = hashlib.sha1()
+    for name in sorted({code, default}):
+        with open(os.path.join(directory, f'{name}.json'), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def load_source(path):
+    with open(path, encoding='utf-8') as f:
+        source = json.load(f)
+    return source.get('language', {}), source['strings']
+
+
+def merge_source(code, source, default_strings):
+    """Catalog for a JSON source, falling back to the default language per string"""
+    language, strings = source
+    return Catalog(code, language.get('name', code), language.get('dir', 'ltr'),
+                   dict(default_strings, **strings))
+
+
+def write_mo(path, catalog, digest):
+    """Write ``catalog`` as a gettext .mo file; the language settings go in its header"""
+    header = (f"Language: {catalog.code}\n"
+              "Content-Type: text/plain; charset=UTF-8\n"
+              f"X-Language-Name: {catalog.name}\n"
+              f"X-Text-Direction: {catalog.direction}\n"
+              f"X-Source-Digest: {digest}\n")
+    entries = sorted([(b'', header.encode('utf-8'))] +
+                     [(key.encode('utf-8'), value.encode('utf-8')) for key, value in catalog.strings.items()])
+
+    keys_offset = 7 * 4
+    values_offset = keys_offset + len(entries) * 8
+    data_offset = values_offset + len(entries) * 8
+    key_table, value_table, data = [], [], bytearray()
+    for table, index in ((key_table, 0), (value_table, 1)):
+        for entry in entries:
+            table.append((len(entry[index]), data_offset + len(data)))
+            data += entry[index] + b'\0'
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(struct.pack('<7I', MO_MAGIC, 0, len(entries), keys_offset, values_offset, 0, 0))
+        for length, offset in key_table + value_table:
+            f.write(struct.pack('<2I', length, offset))
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def read_mo(path, code):
+    """Catalog and source digest from a .mo file written by :func:`write_mo`"""
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mo:
+        magic, _, count, keys_offset, values_offset = struct.unpack_from('<5I', mo)
+        if magic != MO_MAGIC:
+            raise ValueError(f'{path} is not a little-endian .mo file')
+
+        def text(table_offset, index):
+            length, offset = struct.unpack_from('<2I', mo, table_offset + index * 8)
+            return mo[offset:offset + length].decode('utf-8')
+
+        strings = {text(keys_offset, index): text(values_offset, index) for index in range(count)}
+
+    header = dict(line.split(': ', 1) for line in strings.pop('').splitlines() if ': ' in line)
+    catalog = Catalog(code, header.get('X-Language-Name', code), header.get('X-Text-Direction', 'ltr'), strings)
+    return catalog, header.get('X-Source-Digest')
+
+
+def compile_catalogs(directory, default):
+    """Compile every JSON source in ``directory``; returns ``{code: (catalog, filled_in)}``"""
+    sources = {name[:-len('.json')]: load_source(os.path.join(directory, name))
+               for name in sorted(os.listdir(directory)) if name.endswith('.json')}
+    default_strings = sources[default][1]
+    compiled = {}
+    for code, source in sources.items():
+        catalog = merge_source(code, source, default_strings)
+        write_mo(os.path.join(directory, f'{code}.mo'), catalog, source_digest(directory, code, default))
+        compiled[code] = (catalog, len(catalog.strings) - len(source[1]))
+    return compiled
+
+
+class Catalogs:
+    def __init__(self, app=None):
+        self.default = None
+        self._catalogs = {}
+        self.languages = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('I18N_CATALOG_DIR', os.path.join(app.root_path, 'translations'))
+        app.config.setdefault('I18N_DEFAULT_LANGUAGE', 'en')
+        directory = app.config['I18N_CATALOG_DIR']
+        self.default = app.config['I18N_DEFAULT_LANGUAGE']
+
+        codes = sorted(name[:-len('.json')] for name in os.listdir(directory) if name.endswith('.json'))
+        for code in codes:
+            mo_path = os.path.join(directory, f'{code}.mo')
+            if os.path.exists(mo_path):
+                catalog, digest = read_mo(mo_path, code)
+                if digest == source_digest(directory, code, self.default):
+                    self._catalogs[code] = catalog
+                    continue
+            # Uncompiled edits still show up, the worker just does the compile's work itself
+            app.logger.warning('%s is missing or out of date, run "flask i18n-compile"', mo_path)
+            self._catalogs[code] = merge_source(code, load_source(os.path.join(directory, f'{code}.json')),
+                                                load_source(os.path.join(directory, f'{self.default}.json'))[1])
+
+        if self.default not in self._catalogs:
+            raise RuntimeError(f'No catalog for the default language {self.default!r} in {directory}')
+        # Language switcher order: the default language first
+        self.languages = sorted(self._catalogs.values(), key=lambda c: (c.code != self.default, c.code))
+        app.extensions['catalogs'] = self
+
+    def get(self, code):
+        """Catalog for ``code``, or the default language's for unknown codes"""
+        return self._catalogs.get(code) or self._catalogs[self.default]
@@ -0,0 +1,489 @@
+"""``flask`` commands for setup, maintenance and benchmarks; see ``register_commands``."""
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app, g
+from flask.cli import with_appcontext
+
+from catalogs import compile_catalogs
+from extensions import (catalogs, content_versions, db, fragment_cache, image_jobs, page_cache, slide_search,
+                        view_counter)
+from image_jobs import FAILED
+from image_processing import unreferenced_uploads
+from models import SLIDE_ORDER, Activity, Chapter, ImageJob, SectionBullet, Slide, SlideSection, SystemStats, User
+from public import GUIDE_SECTIONS
+from query_plans import check_plans, count_statements
+from slide_import import ManifestError, import_archive
+from sqlite_tuning import PROFILES, profile_pragmas, run_benchmark
+from static_export import export_site
+from stats import add_daily_stats
+
+
+@click.command('stats-backfill')
+@with_appcontext
+def stats_backfill():
+    """Fill in SystemStats history from the Activity table.
+
+    active_users is recomputed for every day with activity.  View totals are
+    only taken from activity for days without a SystemStats row: signed-in
+    views are all activity records, while the existing rows also hold the
+    anonymous views rolled up by the view counter, which must be kept.
+    """
+    activity = Activity.__table__
+    day = db.func.date(activity.c.created_at)
+    is_view = activity.c.action == 'view'
+    rows = db.session.execute(
+        db.select(
+            day.label('day'),
+            db.func.sum(db.case((is_view & (activity.c.target_type == 'chapter'), 1), else_=0)),
+            db.func.sum(db.case((is_view & (activity.c.target_type == 'slide'), 1), else_=0)),
+            db.func.count(db.distinct(activity.c.user_id))
+        ).group_by(day).order_by(day)
+    ).all()
+
+    added = 0
+    with db.engine.begin() as conn:
+        existing = set(conn.execute(db.select(SystemStats.__table__.c.date)).scalars())
+        for day_value, chapter_views, slide_views, active_users in rows:
+            if isinstance(day_value, str):
+                day_value = datetime.strptime(day_value, '%Y-%m-%d').date()
+            if day_value in existing:
+                add_daily_stats(conn, day_value, active_users=active_users)
+            else:
+                add_daily_stats(conn, day_value, chapter_views or 0, slide_views or 0, active_users)
+                added += 1
+
+    print(f"Added {added} and updated {len(rows) - added} daily statistics rows from activity history.")
+
+
+@click.command('search-reindex')
+@with_appcontext
+def search_reindex():
+    """Rebuild the slide full-text search index."""
+    if not slide_search.available:
+        print("SQLite FTS5 is not available; search uses LIKE queries and needs no index.")
+        return
+    print(f"Indexed {slide_search.rebuild()} slides.")
+
+
+def hot_queries():
+    """The filters the public pages and dashboards run, with sample arguments.
+
+    The flag marks queries that may walk an index in order because they stop
+    at a LIMIT.
+    """
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0)
+    return [
+        ('active chapters', Chapter.query.filter_by(is_active=True).order_by(Chapter.order).statement, False),
+        ('chapter slides', Slide.query.filter_by(chapter_id=1, is_active=True).order_by(*SLIDE_ORDER)
+            .limit(24).statement, False),
+        ('next slides', Slide.query.filter_by(chapter_id=1, is_active=True)
+            .filter(db.tuple_(*SLIDE_ORDER) > db.tuple_(5, 5)).order_by(*SLIDE_ORDER).limit(24).statement, False),
+        ('previous slides', Slide.query.filter_by(chapter_id=1, is_active=True)
+            .filter(db.tuple_(*SLIDE_ORDER) < db.tuple_(5, 5))
+            .order_by(*[column.desc() for column in SLIDE_ORDER]).limit(3).statement, False),
+        ('chapter stats', db.select(Slide.chapter_id, db.func.count(Slide.id), db.func.sum(Slide.view_count))
+            .where(Slide.chapter_id.in_([1, 2])).group_by(Slide.chapter_id), False),
+        ('slide sections', db.select(SlideSection).where(SlideSection.slide_id.in_([1, 2])), False),
+        ('section bullets', db.select(SectionBullet).where(SectionBullet.section_id.in_([1, 2])), False),
+        ('recent activity', Activity.query.order_by(Activity.created_at.desc()).limit(10).statement, True),
+        ('user activity', Activity.query.filter_by(user_id=1)
+            .order_by(Activity.created_at.desc()).limit(10).statement, False),
+        ('activity today', db.select(db.func.count()).select_from(Activity)
+            .where(Activity.created_at >= today), False),
+        ('daily active users', db.select(db.func.count(db.distinct(Activity.user_id)))
+            .where(Activity.created_at >= today, Activity.created_at < today + timedelta(days=1)), False),
+    ]
+
+
+@click.command('check-query-plans')
+@with_appcontext
+@click.option('--verbose', is_flag=True, help='Print every plan, not just the failing ones.')
+def check_query_plans(verbose):
+    """Fail if a hot query's plan regresses to a full table scan."""
+    if db.engine.dialect.name != 'sqlite':
+        print("Query plans are only checked on SQLite.")
+        return
+
+    with db.engine.connect() as conn:
+        results = check_plans(conn, hot_queries())
+
+    failed = 0
+    for name, plan, problems in results:
+        print(f"{'FAIL' if problems else 'ok':4}  {name}")
+        for line in problems or (plan if verbose else []):
+            print(f"      {line}")
+        failed += bool(problems)
+
+    if failed:
+        raise click.ClickException(f"{failed} hot queries do not use an index.")
+
+
+def hot_pages():
+    """``(name, url, signed in, statement budget)`` for the pages to count.
+
+    Each budget is the count tests/test_query_counts.py measures, requesting
+    the pages in this order from a fresh process with slides that have
+    sections and bullets, plus two for a harmless extra lookup such as one
+    more content-version scope:
+
+    - home (4): active chapters, their slide stats, the ``chapters``
+      version, the chapter menu snapshot
+    - chapters (3): active chapters, their slide stats, the version
+    - chapter (7): two version lookups, the chapter, its first page of
+      slides, their sections, their bullets, the slide count
+    - slide (9): the slide's chapter id, two version lookups, the slide,
+      its sections, its bullets, its chapter, the previous and next slide
+    - admin dashboard (6): active chapters, slide and user totals, recent
+      activity, slide stats per chapter, the ``chapters`` version
+
+    The test also checks that the counts stay the same when chapters, slides
+    and activity rows are added; a page going over its budget is loading
+    something per row.
+    """
+    chapter = Chapter.query.filter_by(is_active=True).order_by(Chapter.order).first()
+    slide = chapter and Slide.query.filter_by(chapter_id=chapter.id, is_active=True).order_by(*SLIDE_ORDER).first()
+    pages = [('home', '/en', False, 6), ('chapters', '/en/chapters', False, 5)]
+    if chapter:
+        pages.append(('chapter', f'/en/chapter/{chapter.id}', False, 9))
+    if slide:
+        pages.append(('slide', f'/en/slide/{slide.id}', False, 11))
+    pages.append(('admin dashboard', '/en/admin/dashboard', True, 8))
+    return pages
+
+
+def count_page_statements(pages):
+    """``(name, url, status, statements, budget)`` for each of ``pages`` that
+    can be requested, rendered without the caches and the view counter."""
+    admin = User.query.filter_by(role='super_admin', is_active=True).first()
+    app = current_app._get_current_object()
+    # Count the render itself, not cache hits or the background writers
+    enabled = page_cache.enabled, fragment_cache.enabled, view_counter.enabled
+    page_cache.enabled = fragment_cache.enabled = view_counter.enabled = False
+    client = app.test_client()
+    if admin is not None:
+        with client.session_transaction() as session:
+            session['_user_id'] = str(admin.id)
+            session['_fresh'] = True
+
+    try:
+        for name, url, signed_in, budget in pages:
+            if signed_in and admin is None:
+                yield name, url, None, [], budget
+                continue
+            # The test requests share this command's app context, and so its g with
+            # the signed-in user and the content versions read by the previous page
+            g.pop('_login_user', None)
+            g.pop('_content_versions', None)
+            with count_statements(db.engine) as statements:
+                response = (client if signed_in else app.test_client()).get(url)
+            yield name, url, response.status_code, statements, budget
+    finally:
+        page_cache.enabled, fragment_cache.enabled, view_counter.enabled = enabled
+
+
+@click.command('check-query-counts')
+@with_appcontext
+@click.option('--verbose', is_flag=True, help='Print the statements of every page, not just the failing ones.')
+def check_query_counts(verbose):
+    """Fail if a hot page sends more SQL statements than its budget (N+1 queries)."""
+    failed = 0
+    for name, url, status, statements, budget in count_page_statements(hot_pages()):
+        if status is None:
+            print(f"skip  {name}: no active super admin")
+            continue
+        problems = []
+        if status != 200:
+            problems.append(f'{url} returned {status}')
+        if len(statements) > budget:
+            problems.append(f'{len(statements)} statements, budget {budget}')
+        print(f"{'FAIL' if problems else 'ok':4}  {name}: {len(statements)} statements")
+        for line in problems + (statements if problems or verbose else []):
+            print(f"      {' '.join(line.split())}")
+        failed += bool(problems)
+
+    if failed:
+        raise click.ClickException(f"{failed} hot pages send too many statements.")
+
+
+@click.command('sqlite-bench')
+@with_appcontext
+@click.option('--readers', default=4, show_default=True, help='Reading worker processes.')
+@click.option('--writers', default=2, show_default=True, help='Writing worker processes.')
+@click.option('--seconds', default=5.0, show_default=True, help='Duration of each run.')
+@click.option('--profile', 'profiles', multiple=True, type=click.Choice(sorted(PROFILES)),
+              help='Profiles to compare (default: SQLite defaults and the configured profile).')
+def sqlite_bench(readers, writers, seconds, profiles):
+    """Run concurrent reads and writes from several processes on a scratch database."""
+    profiles = profiles or sorted({'default', current_app.config['SQLITE_PROFILE']})
+    for profile in profiles:
+        overrides = current_app.config['SQLITE_PRAGMAS'] if profile == current_app.config['SQLITE_PROFILE'] else {}
+        result = run_benchmark(profile_pragmas(profile, overrides), readers, writers, seconds)
+        print(f"{profile:>10}: {result['reads'] / seconds:9.0f} reads/s  "
+              f"{result['writes'] / seconds:7.0f} writes/s  {result['locked']} locked errors "
+              f"({readers} readers, {writers} writers)")
+
+
+@click.command('uploads-gc')
+@with_appcontext
+@click.option('--min-age', default=3600, show_default=True,
+              help='Keep files younger than this many seconds (uploads for unsaved slides).')
+@click.option('--dry-run', is_flag=True, help='Only list the files that would be removed.')
+def uploads_gc(min_age, dry_run):
+    """Remove uploaded images that no slide references."""
+    referenced = set()
+    for image_filename, thumbnail_filename in db.session.query(Slide.image_filename, Slide.thumbnail_filename):
+        referenced.update((image_filename, thumbnail_filename))
+
+    removed = 0
+    for path in unreferenced_uploads(current_app.config['UPLOAD_FOLDER'], referenced, min_age):
+        print(path)
+        if not dry_run:
+            os.remove(path)
+        removed += 1
+    print(f"{'Would remove' if dry_run else 'Removed'} {removed} unreferenced upload files.")
+
+
+@click.command('import-slides')
+@with_appcontext
+@click.argument('archive', type=click.Path(exists=True, dir_okay=False))
+@click.option('--chapter', 'chapter_id', type=int, help='Chapter for manifest rows without a chapter_id.')
+@click.option('--strict', is_flag=True, help='Import nothing if any row has an error.')
+def import_slides(archive, chapter_id, strict):
+    """Create slides from a ZIP of images and a manifest.csv/manifest.json (see slide_import.py)."""
+    try:
+        report = import_archive(archive, chapter_id=chapter_id, strict=strict)
+    except ManifestError as e:
+        raise click.ClickException(str(e))
+    # Wait for the image jobs, which would otherwise die with this process
+    image_jobs.shutdown()
+    for job in ImageJob.query.filter(ImageJob.id.in_(report['job_ids']), ImageJob.status == FAILED):
+        print(f"image {json.loads(job.payload)['filename']} could not be processed: {job.error}")
+
+    for error in report['errors']:
+        print(f"row {error['row']}: {'; '.join(error['errors'])}")
+    for chapter, count in sorted(report['chapters'].items()):
+        print(f"Chapter {chapter}: {count} slide{'s' if count != 1 else ''} added")
+    print(f"Imported {report['imported']} of {report['rows']} rows.")
+    if report['errors']:
+        raise click.ClickException(f"{len(report['errors'])} rows were not imported.")
+
+
+def create_sample_data():
+    """Create sample data if database is empty"""
+    if Chapter.query.count() == 0:
+        # Create chapters with proper data structure
+        chapters_data = [
+            (1, "Histology", "هیستۆلۆجی",
+             "The study of tissues and their microscopic structure, including epithelial, connective, muscle, and nervous tissues.",
+             "خوێندنی شانەکان و پێکهاتە مایکرۆسکۆپیەکانیان، لەوانە شانەکانی ئەپیتێلیاڵ، پەیوەست، ماسولکە و نەرڤی.",
+             "fas fa-microscope"),
+
+            (2, "Embryology", "ئێمبرۆلۆجی",
+             "Developmental biology focusing on embryonic development from fertilization through organogenesis.",
+             "بایۆلۆجی گەشەپێدان کە سەرنج دەدات بە گەشەپێدانی ئێمبرۆ لە کتنییەوە تا درووستبوونی ئەندامەکان.",
+             "fas fa-baby"),
+
+            (3, "Plant Anatomy", "ئەناتۆمیای ڕووەک",
+             "Structure and function of plant organs including roots, stems, leaves, and reproductive structures.",
+             "پێکهاتە و کارەکانی ئەندامەکانی ڕووەک لەوانە ڕەگ، شەق، گەڵا و پێکهاتەکانی زاوزێ.",
+             "fas fa-leaf"),
+
+            (4, "Parasitology", "پاراسیتۆلۆجی",
+             "Study of parasites, their life cycles, host-parasite relationships, and parasitic diseases.",
+             "خوێندنی گیرۆکەکان، سوڕی ژیانیان، پەیوەندی میوان-گیرۆکە و نەخۆشیە گیرۆکیەکان.",
+             "fas fa-bug"),
+
+            (5, "Hematology", "هیماتۆلۆجی",
+             "Study of blood, blood-forming organs, and blood diseases including cellular components and plasma.",
+             "خوێندنی خوێن، ئەندامە خوێنساز و نەخۆشیەکانی خوێن لەگەڵ پێکهاتە خانەیی و پلازما.",
+             "fas fa-tint"),
+
+            (6, "Microbiology", "مایکرۆبایۆلۆجی",
+             "Study of microorganisms including bacteria, viruses, fungi, and their roles in health and disease.",
+             "خوێندنی زیندەوەرە مایکرۆسکۆپیەکان لەوانە بەکتریا، ڤایرۆس، کەمترشی و ڕۆڵیان لە تەندروستی و نەخۆشیدا.",
+             "fas fa-virus"),
+
+            (7, "Entomology", "ئینتۆمۆلۆجی",
+             "Scientific study of insects, their classification, morphology, physiology, and ecological importance.",
+             "خوێندنی زانستی مێروو، پۆلێنکردنیان، مۆرفۆلۆجی، فیزیۆلۆجی و گرنگی ژینگەییان.",
+             "fas fa-spider"),
+
+            (8, "Algae Studies", "خوێندنی ئاڵگا",
+             "Study of algae, their diversity, classification, structure, and ecological significance.",
+             "خوێندنی ئاڵگاکان، جۆراوجۆریان، پۆلێنکردن، پێکهاتە و گرنگی ژینگەییان.",
+             "fas fa-water")
+        ]
+
+        for order, title_en, title_ckb, desc_en, desc_ckb, icon in chapters_data:
+            chapter = Chapter(
+                order=order,
+                title_en=title_en,
+                title_ckb=title_ckb,
+                description_en=desc_en,
+                description_ckb=desc_ckb,
+                icon=icon
+            )
+            db.session.add(chapter)
+
+        # Create super admin user
+        admin = User(
+            username='admin',
+            email='admin@biology.edu',
+            role='super_admin'
+        )
+        admin.set_password('admin123')
+        db.session.add(admin)
+
+        # Create sample chapter admin
+        chapter_admin = User(
+            username='histology_admin',
+            email='histology@biology.edu',
+            role='chapter_admin',
+            chapter_id=1
+        )
+        chapter_admin.set_password('histology123')
+        db.session.add(chapter_admin)
+
+        try:
+            content_versions.bump('chapters')
+            db.session.commit()
+            print("Sample data created successfully!")
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error creating sample data: {e}")
+
+
+def init_db():
+    """Create missing tables and the search index; safe to run again."""
+    db.create_all()
+    slide_search.ensure()
+
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Create the database tables and the full-text search index."""
+    init_db()
+    print("Database initialized.")
+
+
+@click.command('seed')
+@with_appcontext
+def seed_command():
+    """Add the sample chapters and admin accounts to an empty database."""
+    create_sample_data()
+
+
+@click.command('export-static')
+@with_appcontext
+@click.option('--output', type=click.Path(file_okay=False), help='Target directory (default: STATIC_EXPORT_DIR).')
+@click.option('--full', is_flag=True, help='Render every page, not only those whose content changed.')
+def export_static(output, full):
+    """Render the public pages, static files and uploads into a directory nginx can serve."""
+    output = output or current_app.config['STATIC_EXPORT_DIR']
+    # Rendering a page for the export is not a visit
+    view_counter.enabled = False
+    counts = export_site(current_app, db, output, [catalog.code for catalog in catalogs.languages],
+                         GUIDE_SECTIONS, full=full)
+    print(f"Pages: {counts['rendered']} rendered, {counts['unchanged']} unchanged, {counts['removed']} removed")
+    print(f"Static files: {counts['static_copied']} copied, {counts['static_removed']} removed")
+    print(f"Uploads: {counts['uploads_copied']} copied, {counts['uploads_removed']} removed")
+    print(f"Exported to {os.path.abspath(output)}")
+
+
+@click.command('i18n-compile')
+@with_appcontext
+def i18n_compile():
+    """Compile translations/*.json into the .mo catalogs the workers load."""
+    compiled = compile_catalogs(current_app.config['I18N_CATALOG_DIR'], current_app.config['I18N_DEFAULT_LANGUAGE'])
+    for code, (catalog, filled_in) in compiled.items():
+        note = f", {filled_in} missing, shown in {current_app.config['I18N_DEFAULT_LANGUAGE']}" if filled_in else ''
+        print(f"{code}: {len(catalog.strings)} strings{note}")
+    print("Restart the workers to load the new catalogs.")
+
+
+# Imports the app in a fresh interpreter and times the first requests, i.e.
+# what a newly started gunicorn worker goes through before it serves a page
+STARTUP_BENCH_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+module = __import__(sys.argv[1])
+imported = time.perf_counter()
+client = module.create_app().test_client()
+ready = time.perf_counter()
+requests = []
+for url in sys.argv[3:]:
+    begin = time.perf_counter()
+    client.get(url)
+    requests.append(time.perf_counter() - begin)
+print(json.dumps({'import': imported - start, 'create_app': ready - imported, 'requests': requests,
+                  'heavy': [name for name in sys.argv[2].split(',') if name in sys.modules]}))
+"""
+
+# Packages a public page should not need; the admin/media paths import them on demand
+HEAVY_MODULES = ('PIL', 'alembic', 'flask_migrate')
+
+
+def worker_env():
+    """os.environ without FLASK_RUN_FROM_CLI, so the child starts the app the way gunicorn would"""
+    return {name: value for name, value in os.environ.items() if name != 'FLASK_RUN_FROM_CLI'}
+
+
+def importtime_report(import_name, limit):
+    """Packages with the most import time (self time summed per top-level package)
+    for ``import <import_name>; create_app()``, from ``python -X importtime``."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c',
+                             f'import {import_name}; {import_name}.create_app()'],
+                            cwd=current_app.root_path, env=worker_env(), capture_output=True, text=True, check=True)
+    packages = {}
+    for line in result.stderr.splitlines():
+        fields = line[len('import time:'):].split('|')
+        if not line.startswith('import time:') or len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        package = fields[2].strip().split('.')[0]
+        packages[package] = packages.get(package, 0) + int(fields[0])
+    return sorted(packages.items(), key=lambda item: -item[1])[:limit]
+
+
+@click.command('startup-bench')
+@with_appcontext
+@click.option('--runs', default=5, show_default=True, help='Fresh interpreters to start.')
+@click.option('--url', 'urls', multiple=True, help='Pages requested after startup (default: /en twice).')
+@click.option('--importtime', 'top_imports', default=0, show_default=True,
+              help='Also list this many of the slowest imports (python -X importtime).')
+def startup_bench(runs, urls, top_imports):
+    """Measure cold-start time: import, create_app() and the first requests."""
+    urls = urls or ('/en', '/en')
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', STARTUP_BENCH_SCRIPT, current_app.import_name,
+                                 ','.join(HEAVY_MODULES), *urls],
+                                cwd=current_app.root_path, env=worker_env(), capture_output=True, text=True,
+                                check=True).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+
+    def median_ms(values):
+        return f"{sorted(values)[len(values) // 2] * 1000:8.1f} ms"
+
+    print(f"{'import':>16}: {median_ms([s['import'] for s in samples])}")
+    print(f"{'create_app()':>16}: {median_ms([s['create_app'] for s in samples])}")
+    for index, url in enumerate(urls):
+        print(f"{f'request {index + 1}':>16}: {median_ms([s['requests'][index] for s in samples])}  {url}")
+    print(f"(median of {runs} runs)")
+    print(f"Loaded at startup: {', '.join(samples[0]['heavy']) or 'none of ' + ', '.join(HEAVY_MODULES)}")
+
+    if top_imports:
+        print("Import time by package:")
+        for package, microseconds in importtime_report(current_app.import_name, top_imports):
+            print(f"{package:>24}: {microseconds / 1000:8.1f} ms")
+
+
+def register_commands(app):
+    for command in (init_db_command, seed_command, stats_backfill, search_reindex, check_query_plans,
+                    check_query_counts, sqlite_bench, uploads_gc, import_slides, export_static, i18n_compile, startup_bench):
+        app.cli.add_command(command)
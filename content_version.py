@@ -0,0 +1,71 @@
+"""Content version counters shared by every worker on every host.
+
+Each scope (``'chapters'`` for the navigation list, for example) is a row of
+the ``content_version`` table holding an integer.  Admin edits call
+``bump()`` *before* committing, so the new version lands in the same
+transaction as the edit and no host can see one without the other.
+Readers call ``get()``, a primary-key lookup remembered for the rest of the
+request, so caches in any process notice the change on their next request.
+"""
+import time
+
+from flask import g
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+
+class ContentVersions:
+    def __init__(self, app=None, db=None, model=None):
+        self.db = None
+        self.table = None
+        if app is not None:
+            self.init_app(app, db, model)
+
+    def init_app(self, app, db, model):
+        self.db = db
+        self.table = model.__table__
+        app.extensions['content_versions'] = self
+
+    def _seen(self):
+        if '_content_versions' not in g:
+            g._content_versions = {}
+        return g._content_versions
+
+    def get(self, scope):
+        """Current version of ``scope``; 0 if it has never been bumped."""
+        return self.token(scope)[0]
+
+    def token(self, *scopes):
+        """Tuple of the versions of several scopes, usable as a cache key part."""
+        seen = self._seen()
+        missing = [scope for scope in scopes if scope not in seen]
+        if missing:
+            rows = self.db.session.execute(
+                self.db.select(self.table.c.scope, self.table.c.version).where(self.table.c.scope.in_(missing))
+            ).all()
+            seen.update(dict.fromkeys(missing, 0))
+            seen.update(rows)
+        return tuple(seen[scope] for scope in scopes)
+
+    def bump(self, *scopes, conn=None):
+        """Advance each scope to a new, strictly larger version.
+
+        Runs in the session's transaction, or in ``conn``'s when given; the
+        caller commits it with the edit.
+        """
+        table = self.table
+        executor = conn if conn is not None else self.db.session
+        dialect = (conn if conn is not None else self.db.session.get_bind()).dialect.name
+        now = time.time_ns()
+        seen = self._seen()
+        for scope in scopes:
+            seen.pop(scope, None)
+            newer = self.db.case((table.c.version < now, now), else_=table.c.version + 1)
+            if dialect in ('postgresql', 'sqlite'):
+                dialect_insert = postgresql_insert if dialect == 'postgresql' else sqlite_insert
+                executor.execute(dialect_insert(table).values(scope=scope, version=now)
+                                 .on_conflict_do_update(index_elements=[table.c.scope], set_={'version': newer}))
+                continue
+            result = executor.execute(self.db.update(table).where(table.c.scope == scope).values(version=newer))
+            if result.rowcount == 0:
+                executor.execute(self.db.insert(table).values(scope=scope, version=now))
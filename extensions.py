@@ -0,0 +1,52 @@
+"""Extension instances shared by the blueprints; ``create_app()`` binds them to the app."""
+from flask import request
+from flask_login import LoginManager, current_user
+from flask_sqlalchemy import SQLAlchemy
+
+from activity_sink import ActivitySink
+from asset_manifest import AssetManifest
+from catalogs import Catalogs
+from content_version import ContentVersions
+from image_jobs import ImageJobQueue
+from page_cache import FragmentCache, PageCache
+from search import SlideSearch
+from sqlite_tuning import SQLiteTuning
+from view_counter import ViewCounterBuffer
+
+db = SQLAlchemy()
+sqlite_tuning = SQLiteTuning()
+
+login_manager = LoginManager()
+login_manager.login_view = 'admin.admin_login'
+
+content_versions = ContentVersions()
+
+
+def _page_cache_bypass():
+    # An unknown language shows the default one; caching it under every code
+    # a client makes up would fill the cache with copies of the same pages
+    lang = (request.view_args or {}).get('lang')
+    return current_user.is_authenticated or (lang is not None and catalogs.get(lang).code != lang)
+
+
+page_cache = PageCache(bypass=_page_cache_bypass)
+# Per-language markup shared by every page, e.g. the chapter menu
+fragment_cache = FragmentCache()
+
+# UI strings, compiled from translations/*.json
+catalogs = Catalogs()
+
+# Cache-busting ?v=<hash> for static files and uploads; digest-named uploads need none
+asset_manifest = AssetManifest()
+
+# Write-behind buffer for public page view counters
+view_counter = ViewCounterBuffer()
+
+# Background writer for the Activity audit log
+activity_sink = ActivitySink()
+
+# Pillow work for uploads and crops runs in a process pool
+image_jobs = ImageJobQueue()
+
+# FTS5 index over slide text, kept in sync by the slide admin views
+slide_search = SlideSearch()
@@ -0,0 +1,8 @@
+"""Language selection for views; the strings live in translations/ (see catalogs.py)."""
+from extensions import catalogs
+
+
+def pick_lang(lang):
+    """Language picker with fallback to the default language"""
+    catalog = catalogs.get(lang)
+    return catalog.code, catalog.strings, catalog.code
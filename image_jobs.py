@@ -0,0 +1,180 @@
+"""Persistent background queue for image processing.
+
+Uploads and crops are recorded as ``ImageJob`` rows and handed to a process
+pool, so the request returns a job id straight away and the admin editor
+polls the status endpoint.  Because jobs live in the database, pending work
+(and work that was running when a worker died) is picked up again by
+:meth:`ImageJobQueue.resume` after a restart, or by :meth:`ImageJobQueue.get`
+when a job polled for has gone stale in the meantime.
+"""
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class ImageJobQueue:
+    def __init__(self, app=None, db=None, model=None, tasks=None):
+        self.app = None
+        self.db = None
+        self.model = None
+        self.tasks = {}
+        self.workers = 2
+        self.stale_after = timedelta(minutes=10)
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._done_hooks = []
+        if app is not None:
+            self.init_app(app, db, model, tasks)
+
+    def init_app(self, app, db, model, tasks):
+        # 0 runs jobs inline in the request, which is handy for debugging
+        app.config.setdefault('IMAGE_JOB_WORKERS', 2)
+        app.config.setdefault('IMAGE_JOB_STALE_AFTER', 600)
+        self.app = app
+        self.db = db
+        self.model = model
+        self.tasks = dict(tasks)
+        self.workers = int(app.config['IMAGE_JOB_WORKERS'])
+        self.stale_after = timedelta(seconds=int(app.config['IMAGE_JOB_STALE_AFTER']))
+        app.extensions['image_jobs'] = self
+
+    def submit(self, kind, payload, user_id=None):
+        """Persist a new job and start it; returns the job id."""
+        if kind not in self.tasks:
+            raise KeyError(f'Unknown image job kind: {kind}')
+        now = datetime.utcnow()
+        job = self.model(id=uuid.uuid4().hex, kind=kind, status=PENDING, payload=json.dumps(payload),
+                         user_id=user_id, created_at=now, updated_at=now)
+        self.db.session.add(job)
+        self.db.session.commit()
+        self._dispatch(job.id, kind, payload)
+        return job.id
+
+    def get(self, job_id):
+        """The job, re-queued first if it has been pending or running for longer
+        than ``IMAGE_JOB_STALE_AFTER``, i.e. its worker died after startup."""
+        job = self.db.session.get(self.model, job_id)
+        if (job is not None and job.status in (PENDING, RUNNING)
+                and job.updated_at < datetime.utcnow() - self.stale_after):
+            self._requeue(job.id, job.kind, json.loads(job.payload))
+            self.db.session.refresh(job)
+        return job
+
+    def resume(self):
+        """Re-dispatch pending jobs and jobs left running by a dead worker."""
+        table = self.model.__table__
+        with self.db.engine.begin() as conn:
+            conn.execute(
+                update(table)
+                .where(table.c.status == RUNNING, table.c.updated_at < datetime.utcnow() - self.stale_after)
+                .values(status=PENDING, updated_at=datetime.utcnow())
+            )
+            pending = conn.execute(
+                table.select().where(table.c.status == PENDING).order_by(table.c.created_at)
+            ).all()
+        for row in pending:
+            self._dispatch(row.id, row.kind, json.loads(row.payload))
+        return len(pending)
+
+    def add_done_hook(self, func):
+        """Call ``func(conn, kind, result)`` inside the transaction that records
+        a successful job, so hooks can attach the result to other rows."""
+        self._done_hooks.append(func)
+        return func
+
+    def shutdown(self):
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=True)
+        self._executor = None
+
+    def _requeue(self, job_id, kind, payload):
+        # The staleness check in the WHERE clause lets only one poller win
+        table = self.model.__table__
+        with self.db.engine.begin() as conn:
+            result = conn.execute(
+                update(table)
+                .where(table.c.id == job_id, table.c.status.in_((PENDING, RUNNING)),
+                       table.c.updated_at < datetime.utcnow() - self.stale_after)
+                .values(status=PENDING, updated_at=datetime.utcnow())
+            )
+        if result.rowcount == 1:
+            logger.warning('Image job %s went stale, queueing it again', job_id)
+            self._dispatch(job_id, kind, payload)
+
+    def _claim(self, job_id):
+        # Only one worker process may move a job from pending to running
+        table = self.model.__table__
+        with self.db.engine.begin() as conn:
+            result = conn.execute(
+                update(table)
+                .where(table.c.id == job_id, table.c.status == PENDING)
+                .values(status=RUNNING, updated_at=datetime.utcnow())
+            )
+        return result.rowcount == 1
+
+    def _dispatch(self, job_id, kind, payload):
+        if not self._claim(job_id):
+            return
+        task = self.tasks[kind]
+        if self.workers <= 0:
+            try:
+                result = task(**payload)
+            except Exception as e:
+                self._finish(job_id, kind, error=e)
+            else:
+                self._finish(job_id, kind, result=result)
+            return
+
+        future = self._get_executor().submit(task, **payload)
+        future.add_done_callback(lambda f: self._on_done(job_id, kind, f))
+
+    def _on_done(self, job_id, kind, future):
+        error = future.exception()
+        if error is not None:
+            self._finish(job_id, kind, error=error)
+        else:
+            self._finish(job_id, kind, result=future.result())
+
+    def _finish(self, job_id, kind, result=None, error=None):
+        table = self.model.__table__
+        values = {'updated_at': datetime.utcnow()}
+        if error is not None:
+            logger.error('Image job %s failed: %s', job_id, error)
+            values.update(status=FAILED, error=str(error)[:1000])
+        else:
+            values.update(status=DONE, result=json.dumps(result))
+        try:
+            with self.app.app_context():
+                with self.db.engine.begin() as conn:
+                    conn.execute(update(table).where(table.c.id == job_id).values(**values))
+                    if error is None:
+                        for hook in self._done_hooks:
+                            hook(conn, kind, result)
+        except Exception:
+            logger.exception('Could not record the outcome of image job %s', job_id)
+
+    def _get_executor(self):
+        # Spawned (not forked) children start clean instead of inheriting
+        # the app's threads and DB connections, and a pool is never shared
+        # across a gunicorn fork.
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+            return self._executor
@@ -0,0 +1,310 @@
+"""Pillow work for uploaded slide images.
+
+Everything here operates on paths and plain option dicts only (no Flask
+app, no database), so the same functions run inside the request process
+and inside the image job process pool.  ``options`` carries the relevant
+app config: ``variant_widths``, ``modern_formats`` and ``modern_quality``.
+Pillow is imported by the functions that use it, so the web process only
+loads it once an admin actually touches an image.
+
+Uploads are content addressed: a slide image is stored as
+``<sha256 of the uploaded bytes>.<ext>`` and its thumbnail, variants and
+modern encodes are named after it, so identical uploads share one set of
+files and every URL always refers to the same bytes.
+"""
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import time
+
+MODERN_MIMETYPES = {'avif': 'image/avif', 'webp': 'image/webp'}
+
+logger = logging.getLogger(__name__)
+
+CONTENT_ADDRESSED_RE = re.compile(r'^(?:thumb_)?[0-9a-f]{64}(?:_w\d+)?\.\w+(?:\.(?:avif|webp))?$')
+
+
+def save_upload(stream, directory, chunk_size=64 * 1024):
+    """Write ``stream`` to a temporary file in ``directory`` while hashing it.
+
+    Returns ``(temp_path, sha256 hexdigest)``.
+    """
+    digest = hashlib.sha256()
+    fd, temp_path = tempfile.mkstemp(prefix='.upload-', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            for chunk in iter(lambda: stream.read(chunk_size), b''):
+                digest.update(chunk)
+                out.write(chunk)
+    except Exception:
+        os.remove(temp_path)
+        raise
+    return temp_path, digest.hexdigest()
+
+
+def hash_file(path, chunk_size=64 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def content_filename(digest, ext):
+    return f"{digest}.{ext.lower().lstrip('.')}"
+
+
+def is_content_addressed(filename):
+    """True for upload names derived from a content digest (safe to cache forever)"""
+    return bool(CONTENT_ADDRESSED_RE.match(os.path.basename(filename)))
+
+
+def upload_stem(filename):
+    """Name shared by an upload and all files derived from it"""
+    name = os.path.basename(filename)
+    if name.startswith('thumb_'):
+        name = name[len('thumb_'):]
+    return re.sub(r'_w\d+$', '', name.split('.', 1)[0])
+
+
+def create_thumbnail(image_path, thumbnail_path, size=(300, 300)):
+    """Create thumbnail for uploaded image"""
+    from PIL import Image
+    try:
+        with Image.open(image_path) as img:
+            # Convert RGBA to RGB if necessary
+            if img.mode in ('RGBA', 'LA'):
+                background = Image.new('RGB', img.size, (255, 255, 255))
+                if img.mode == 'RGBA':
+                    background.paste(img, mask=img.split()[-1])
+                else:
+                    background.paste(img, mask=img.split()[-1])
+                img = background
+
+            # Create thumbnail maintaining aspect ratio
+            img.thumbnail(size, Image.Resampling.LANCZOS)
+            img.save(thumbnail_path, 'JPEG', quality=85, optimize=True)
+            return True
+    except Exception:
+        logger.exception('Error creating thumbnail for %s', image_path)
+        return False
+
+
+def compress_image(image_path, max_size=(1920, 1080), quality=85):
+    """Compress image to reduce file size"""
+    from PIL import Image
+    try:
+        with Image.open(image_path) as img:
+            # Convert RGBA to RGB if necessary
+            if img.mode in ('RGBA', 'LA'):
+                background = Image.new('RGB', img.size, (255, 255, 255))
+                if img.mode == 'RGBA':
+                    background.paste(img, mask=img.split()[-1])
+                else:
+                    background.paste(img, mask=img.split()[-1])
+                img = background
+
+            # Resize if image is too large
+            if img.size[0] > max_size[0] or img.size[1] > max_size[1]:
+                img.thumbnail(max_size, Image.Resampling.LANCZOS)
+
+            # Save with compression
+            img.save(image_path, 'JPEG', quality=quality, optimize=True)
+            return True
+    except Exception:
+        logger.exception('Error compressing %s', image_path)
+        return False
+
+
+def modern_formats(options):
+    """Configured modern formats this Pillow build can encode"""
+    from PIL import features as pil_features
+    return [fmt for fmt in options['modern_formats'] if pil_features.check(fmt)]
+
+
+def create_modern_encodes(image_path, options):
+    """Write WebP/AVIF siblings (``<file>.webp``, ``<file>.avif``) of an uploaded image"""
+    from PIL import Image
+    try:
+        with Image.open(image_path) as img:
+            if img.mode not in ('RGB', 'L'):
+                img = img.convert('RGB')
+            for fmt in modern_formats(options):
+                quality = options['modern_quality'].get(fmt, 80)
+                img.save(f"{image_path}.{fmt}", fmt.upper(), quality=quality)
+    except Exception:
+        logger.exception('Error creating modern encodes for %s', image_path)
+
+
+def remove_upload(path):
+    """Delete an uploaded file together with its WebP/AVIF siblings"""
+    for candidate in [path] + [f"{path}.{fmt}" for fmt in MODERN_MIMETYPES]:
+        if os.path.exists(candidate):
+            os.remove(candidate)
+
+
+def variant_filename(filename, width):
+    """Filename of the ``width``-pixel copy of an uploaded image"""
+    name = filename.rsplit('.', 1)[0]
+    return f"{name}_w{width}.jpg"
+
+
+def create_image_variants(image_path, options, quality=82):
+    """Create downscaled JPEG copies of an uploaded image for srcset.
+
+    Only widths smaller than the image are generated.  Returns
+    ``[[width, filename], ...]`` in ascending order, ending with the image
+    itself at its own width.
+    """
+    from PIL import Image
+    filename = os.path.basename(image_path)
+    variants = []
+    try:
+        with Image.open(image_path) as img:
+            if img.mode not in ('RGB', 'L'):
+                img = img.convert('RGB')
+            original_width = img.size[0]
+            for width in sorted(options['variant_widths']):
+                if width >= original_width:
+                    break
+                height = max(1, round(img.size[1] * width / original_width))
+                resized = img.resize((width, height), Image.Resampling.LANCZOS)
+                name = variant_filename(filename, width)
+                variant_path = os.path.join(os.path.dirname(image_path), name)
+                resized.save(variant_path, 'JPEG', quality=quality, optimize=True, progressive=True)
+                create_modern_encodes(variant_path, options)
+                variants.append([width, name])
+            variants.append([original_width, filename])
+    except Exception:
+        logger.exception('Error creating image variants for %s', image_path)
+    return variants
+
+
+def find_image_variants(slides_dir, filename, options):
+    """Variants already on disk for an uploaded image, in create_image_variants() form"""
+    from PIL import Image
+    image_path = os.path.join(slides_dir, filename)
+    if not filename or not os.path.exists(image_path):
+        return []
+    try:
+        with Image.open(image_path) as img:
+            original_width = img.size[0]
+    except Exception:
+        return []
+    variants = [[width, variant_filename(filename, width)]
+                for width in sorted(options['variant_widths'])
+                if width < original_width
+                and os.path.exists(os.path.join(slides_dir, variant_filename(filename, width)))]
+    variants.append([original_width, filename])
+    return variants
+
+
+def remove_image_variants(slides_dir, filename, options):
+    """Delete the responsive copies of an uploaded image"""
+    for width in options['variant_widths']:
+        remove_upload(os.path.join(slides_dir, variant_filename(filename, width)))
+
+
+def is_processed(upload_folder, filename):
+    """Whether a stored upload already has its derived files"""
+    return (os.path.exists(os.path.join(upload_folder, 'slides', filename))
+            and os.path.exists(os.path.join(upload_folder, 'thumbnails', f"thumb_{filename}")))
+
+
+def stored_result(upload_folder, filename, options):
+    """Result dict for an upload that is already on disk"""
+    slides_dir = os.path.join(upload_folder, 'slides')
+    return {'filename': filename, 'thumbnail_filename': f"thumb_{filename}",
+            'variants': find_image_variants(slides_dir, filename, options)}
+
+
+def _derive(upload_folder, filename, options):
+    # The thumbnail is written last; is_processed() relies on that.
+    image_path = os.path.join(upload_folder, 'slides', filename)
+    create_modern_encodes(image_path, options)
+    variants = create_image_variants(image_path, options)
+
+    thumbnail_filename = f"thumb_{filename}"
+    thumbnail_path = os.path.join(upload_folder, 'thumbnails', thumbnail_filename)
+    create_thumbnail(image_path, thumbnail_path)
+    create_modern_encodes(thumbnail_path, options)
+
+    return {'filename': filename, 'thumbnail_filename': thumbnail_filename, 'variants': variants}
+
+
+def process_upload(upload_folder, source, filename, options):
+    """Full pipeline for an upload saved by save_upload().
+
+    ``source`` (a temp file in ``slides/``) is compressed and then moved to
+    its content-addressed ``filename``, after which the thumbnail, responsive
+    variants and modern encodes are written.  If another job already stored
+    the same content the source is simply discarded.
+    """
+    source_path = os.path.join(upload_folder, 'slides', source)
+    if is_processed(upload_folder, filename):
+        if os.path.exists(source_path):
+            os.remove(source_path)
+        return stored_result(upload_folder, filename, options)
+
+    # A resumed job may find the source already moved into place
+    if os.path.exists(source_path):
+        compress_image(source_path)
+        os.replace(source_path, os.path.join(upload_folder, 'slides', filename))
+    return _derive(upload_folder, filename, options)
+
+
+def process_crop(upload_folder, filename, crop_data, options):
+    """Crop an uploaded image into a new content-addressed file.
+
+    The original is left alone because other slides may share it; files no
+    slide references are removed by ``flask uploads-gc``.
+    """
+    from PIL import Image
+    slides_dir = os.path.join(upload_folder, 'slides')
+    image_path = os.path.join(slides_dir, filename)
+    if not os.path.exists(image_path):
+        raise FileNotFoundError('Image file not found')
+
+    ext = os.path.splitext(filename)[1]
+    fd, temp_path = tempfile.mkstemp(prefix='.crop-', suffix=ext, dir=slides_dir)
+    os.close(fd)
+    try:
+        with Image.open(image_path) as img:
+            x = int(crop_data['x'])
+            y = int(crop_data['y'])
+            width = int(crop_data['width'])
+            height = int(crop_data['height'])
+            cropped = img.crop((x, y, x + width, y + height))
+            cropped.save(temp_path, quality=90, optimize=True)
+
+        cropped_filename = content_filename(hash_file(temp_path), ext)
+        if is_processed(upload_folder, cropped_filename):
+            return stored_result(upload_folder, cropped_filename, options)
+        os.replace(temp_path, os.path.join(slides_dir, cropped_filename))
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    return _derive(upload_folder, cropped_filename, options)
+
+
+def unreferenced_uploads(upload_folder, referenced, min_age=3600):
+    """Paths of stored uploads whose stem no name in ``referenced`` shares.
+
+    Files younger than ``min_age`` seconds are skipped so images uploaded
+    for a slide that has not been saved yet survive.
+    """
+    keep = {upload_stem(name) for name in referenced if name}
+    cutoff = time.time() - min_age
+    for subdir in ('slides', 'thumbnails'):
+        directory = os.path.join(upload_folder, subdir)
+        if not os.path.isdir(directory):
+            continue
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if not os.path.isfile(path) or os.path.getmtime(path) > cutoff:
+                continue
+            if upload_stem(name) not in keep:
+                yield path
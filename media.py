@@ -0,0 +1,184 @@
+"""Uploaded images: serving, upload/crop endpoints and the image job status API.
+
+Pillow itself is only imported by image_processing when an image is
+actually processed, mostly inside the job worker processes.
+"""
+import json
+import os
+
+from flask import Blueprint, current_app, jsonify, request, send_from_directory, url_for
+from flask_login import current_user
+from werkzeug.utils import secure_filename
+
+from auth import admin_required
+from extensions import image_jobs
+from i18n import pick_lang
+from image_processing import (MODERN_MIMETYPES, content_filename, find_image_variants, is_processed,
+                              remove_image_variants, remove_upload, save_upload, stored_result)
+from models import Slide
+
+bp = Blueprint('media', __name__)
+
+
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
+
+
+def release_slide_image(image_filename, thumbnail_filename=None):
+    """Delete an upload's files once no slide refers to it any more.
+
+    Uploads are content addressed and shared between slides, so the
+    reference count is the number of slides (deleted ones included, since
+    deletion is soft) that still use the file.
+    """
+    if not image_filename:
+        return False
+    if Slide.query.filter_by(image_filename=image_filename).count():
+        return False
+    slides_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'slides')
+    remove_upload(os.path.join(slides_dir, image_filename))
+    remove_image_variants(slides_dir, image_filename, image_options())
+    if thumbnail_filename and not Slide.query.filter_by(thumbnail_filename=thumbnail_filename).count():
+        remove_upload(os.path.join(current_app.config['UPLOAD_FOLDER'], 'thumbnails', thumbnail_filename))
+    return True
+
+
+def image_options():
+    """Image pipeline settings handed to image_processing (also inside job workers)"""
+    return {
+        'variant_widths': list(current_app.config['IMAGE_VARIANT_WIDTHS']),
+        'modern_formats': list(current_app.config['IMAGE_MODERN_FORMATS']),
+        'modern_quality': dict(current_app.config['IMAGE_MODERN_QUALITY']),
+    }
+
+
+def slide_image_variants(filename):
+    """JSON for Slide.image_variants from the copies of ``filename`` on disk"""
+    slides_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'slides')
+    return json.dumps(find_image_variants(slides_dir, filename, image_options()))
+
+
+@bp.route('/uploads/<path:filename>')
+def uploaded_file(filename):
+    """Serve an upload, preferring an AVIF/WebP sibling the browser accepts"""
+    accepted = {mimetype for mimetype, quality in request.accept_mimetypes if quality > 0}
+    for fmt in current_app.config['IMAGE_MODERN_FORMATS']:
+        candidate = f"{filename}.{fmt}"
+        if MODERN_MIMETYPES[fmt] in accepted and \
+                os.path.isfile(os.path.join(current_app.config['UPLOAD_FOLDER'], candidate)):
+            response = send_from_directory(current_app.config['UPLOAD_FOLDER'], candidate,
+                                           mimetype=MODERN_MIMETYPES[fmt])
+            break
+    else:
+        response = send_from_directory(current_app.config['UPLOAD_FOLDER'], filename)
+    response.vary.add('Accept')
+    return response
+
+
+@bp.route('/api/<lang>/upload-image', methods=['POST'])
+@admin_required
+def upload_image(lang):
+    """Handle image upload"""
+    lang, t, lang_code = pick_lang(lang)
+
+    if 'image' not in request.files:
+        return jsonify({'success': False, 'message': 'No image file provided'})
+
+    file = request.files['image']
+    if file.filename == '':
+        return jsonify({'success': False, 'message': 'No image selected'})
+
+    if not allowed_file(file.filename):
+        return jsonify({'success': False, 'message': t['invalid_file_type']})
+
+    try:
+        # Store under the digest of the uploaded bytes so duplicates share files
+        slides_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'slides')
+        temp_path, digest = save_upload(file.stream, slides_dir)
+        filename = content_filename(digest, file.filename.rsplit('.', 1)[1])
+
+        if is_processed(current_app.config['UPLOAD_FOLDER'], filename):
+            os.remove(temp_path)
+            result = stored_result(current_app.config['UPLOAD_FOLDER'], filename, image_options())
+            return jsonify(image_result_data(result, t))
+
+        # Compression, thumbnail and variants run in the job pool
+        job_id = image_jobs.submit('upload', {
+            'upload_folder': current_app.config['UPLOAD_FOLDER'],
+            'source': os.path.basename(temp_path),
+            'filename': filename,
+            'options': image_options()
+        }, user_id=current_user.id)
+
+        return jsonify({
+            'success': True,
+            'job_id': job_id,
+            'status': 'pending',
+            'status_url': url_for('media.image_job_status', lang=lang, job_id=job_id)
+        }), 202
+
+    except Exception:
+        current_app.logger.exception('Image upload failed')
+        return jsonify({'success': False, 'message': t['upload_error']})
+
+
+def image_result_data(result, t):
+    """JSON the slide editor expects for a processed image"""
+    data = dict(result, success=True, status='done', message=t['upload_success'])
+    data['image_url'] = url_for('media.uploaded_file', filename=f"slides/{result['filename']}")
+    data['thumbnail_url'] = url_for('media.uploaded_file', filename=f"thumbnails/{result['thumbnail_filename']}")
+    return data
+
+
+@bp.route('/api/<lang>/image-jobs/<job_id>')
+@admin_required
+def image_job_status(lang, job_id):
+    """Status of a queued upload/crop; includes the image URLs once done.
+    Only the admin who submitted the job can see it."""
+    lang, t, lang_code = pick_lang(lang)
+    job = image_jobs.get(job_id)
+    if job is None or job.user_id != current_user.id:
+        return jsonify({'success': False, 'message': 'Unknown job'}), 404
+
+    data = {'success': True, 'job_id': job.id, 'status': job.status}
+    if job.status == 'done':
+        data.update(image_result_data(job.get_result(), t))
+    elif job.status == 'failed':
+        data['success'] = False
+        data['message'] = t['upload_error']
+    return jsonify(data)
+
+
+@bp.route('/api/<lang>/crop-image', methods=['POST'])
+@admin_required
+def crop_image(lang):
+    """Queue cropping of an uploaded image; poll image_job_status for the result"""
+    data = request.get_json()
+    filename = data.get('filename')
+    crop_data = data.get('crop_data')
+
+    if not filename or not crop_data:
+        return jsonify({'success': False, 'message': 'Missing required data'})
+
+    filename = secure_filename(filename)
+    if not os.path.exists(os.path.join(current_app.config['UPLOAD_FOLDER'], 'slides', filename)):
+        return jsonify({'success': False, 'message': 'Image file not found'})
+
+    try:
+        crop_data = {key: int(crop_data[key]) for key in ('x', 'y', 'width', 'height')}
+        job_id = image_jobs.submit('crop', {
+            'upload_folder': current_app.config['UPLOAD_FOLDER'],
+            'filename': filename,
+            'crop_data': crop_data,
+            'options': image_options()
+        }, user_id=current_user.id)
+    except Exception as e:
+        current_app.logger.exception('Could not queue image crop')
+        return jsonify({'success': False, 'message': f'Error cropping image: {str(e)}'})
+
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status': 'pending',
+        'status_url': url_for('media.image_job_status', lang=lang, job_id=job_id)
+    }), 202
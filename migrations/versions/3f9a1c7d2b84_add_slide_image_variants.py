@@ -0,0 +1,26 @@
+"""add slide image variants
+
+Revision ID: 3f9a1c7d2b84
+Revises: 6c3d23bcd2f0
+Create Date: 2026-10-18 09:12:40.118302
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9a1c7d2b84'
+down_revision = '6c3d23bcd2f0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('slide', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('image_variants', sa.Text(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('slide', schema=None) as batch_op:
+        batch_op.drop_column('image_variants')
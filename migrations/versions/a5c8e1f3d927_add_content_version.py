@@ -0,0 +1,28 @@
+"""add content version
+
+Revision ID: a5c8e1f3d927
+Revises: e2b6f4a81c07
+Create Date: 2026-10-18 21:12:44.108362
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a5c8e1f3d927'
+down_revision = 'e2b6f4a81c07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('content_version',
+    sa.Column('scope', sa.String(length=64), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('scope')
+    )
+
+
+def downgrade():
+    op.drop_table('content_version')
@@ -0,0 +1,137 @@
+"""normalize slide sections
+
+Moves Slide.dynamic_sections JSON into slide_section / section_bullet rows.
+Databases built from the initial migration never had that column (their
+slide table has the older sections_data instead), so the copy is skipped
+there.  Offline (``--sql``) runs only emit the DDL, since copying the
+data needs a live connection.
+
+Revision ID: c71e4a9d3b5f
+Revises: 8b2e5d41c9f3
+Create Date: 2026-10-18 14:05:17.442910
+
+"""
+import json
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c71e4a9d3b5f'
+down_revision = '8b2e5d41c9f3'
+branch_labels = None
+depends_on = None
+
+
+metadata = sa.MetaData()
+slide = sa.Table('slide', metadata, sa.Column('id', sa.Integer, primary_key=True),
+                 sa.Column('dynamic_sections', sa.Text))
+slide_section = sa.Table('slide_section', metadata, sa.Column('id', sa.Integer, primary_key=True),
+                         sa.Column('slide_id', sa.Integer), sa.Column('position', sa.Integer),
+                         sa.Column('name', sa.String))
+section_bullet = sa.Table('section_bullet', metadata, sa.Column('id', sa.Integer, primary_key=True),
+                          sa.Column('section_id', sa.Integer), sa.Column('position', sa.Integer),
+                          sa.Column('text', sa.Text))
+
+
+def slide_columns(conn):
+    return {column['name'] for column in sa.inspect(conn).get_columns('slide')}
+
+
+def upgrade():
+    op.create_table('slide_section',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('slide_id', sa.Integer(), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=200), nullable=True),
+    sa.ForeignKeyConstraint(['slide_id'], ['slide.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('slide_section', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_slide_section_slide_id'), ['slide_id'], unique=False)
+
+    op.create_table('section_bullet',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('section_id', sa.Integer(), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('text', sa.Text(), nullable=False),
+    sa.ForeignKeyConstraint(['section_id'], ['slide_section.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('section_bullet', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_section_bullet_section_id'), ['section_id'], unique=False)
+
+    if context.is_offline_mode():
+        return
+    conn = op.get_bind()
+    if 'dynamic_sections' not in slide_columns(conn):
+        return
+
+    rows = conn.execute(sa.select(slide.c.id, slide.c.dynamic_sections)
+                        .where(slide.c.dynamic_sections.isnot(None))).all()
+    for slide_id, raw in rows:
+        try:
+            sections = json.loads(raw)
+        except ValueError:
+            print(f"Skipping unreadable dynamic_sections of slide {slide_id}")
+            continue
+        if not isinstance(sections, list):
+            continue
+        position = 0
+        for section in sections:
+            if not isinstance(section, dict):
+                continue
+            name = str(section.get('name') or section.get('name_en') or '').strip()
+            result = conn.execute(slide_section.insert().values(slide_id=slide_id, position=position, name=name))
+            bullets = [str(bullet).strip() for bullet in section.get('bullets') or [] if str(bullet).strip()]
+            if bullets:
+                conn.execute(section_bullet.insert(), [
+                    {'section_id': result.inserted_primary_key[0], 'position': index, 'text': bullet}
+                    for index, bullet in enumerate(bullets)
+                ])
+            position += 1
+
+    with op.batch_alter_table('slide', schema=None) as batch_op:
+        batch_op.drop_column('dynamic_sections')
+
+
+def downgrade():
+    if context.is_offline_mode():
+        with op.batch_alter_table('slide', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('dynamic_sections', sa.Text(), nullable=True))
+        drop_section_tables()
+        return
+
+    conn = op.get_bind()
+    if 'dynamic_sections' not in slide_columns(conn):
+        with op.batch_alter_table('slide', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('dynamic_sections', sa.Text(), nullable=True))
+
+    sections = {}
+    for section_id, slide_id, name in conn.execute(
+            sa.select(slide_section.c.id, slide_section.c.slide_id, slide_section.c.name)
+            .order_by(slide_section.c.slide_id, slide_section.c.position)):
+        sections.setdefault(slide_id, []).append((section_id, {'name': name or '', 'bullets': []}))
+    bullets = {}
+    for section_id, text in conn.execute(
+            sa.select(section_bullet.c.section_id, section_bullet.c.text)
+            .order_by(section_bullet.c.section_id, section_bullet.c.position)):
+        bullets.setdefault(section_id, []).append(text)
+    for slide_id, items in sections.items():
+        data = [dict(item, bullets=bullets.get(section_id, [])) for section_id, item in items]
+        conn.execute(slide.update().where(slide.c.id == slide_id)
+                     .values(dynamic_sections=json.dumps(data, ensure_ascii=False)))
+
+    drop_section_tables()
+
+
+def drop_section_tables():
+    with op.batch_alter_table('section_bullet', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_section_bullet_section_id'))
+
+    op.drop_table('section_bullet')
+    with op.batch_alter_table('slide_section', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_slide_section_slide_id'))
+
+    op.drop_table('slide_section')
@@ -0,0 +1,40 @@
+"""add hot query indexes
+
+Revision ID: d4a7b2e9f160
+Revises: c71e4a9d3b5f
+Create Date: 2026-10-18 15:21:03.918544
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4a7b2e9f160'
+down_revision = 'c71e4a9d3b5f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('chapter', schema=None) as batch_op:
+        batch_op.create_index('ix_chapter_active_order', ['is_active', 'order'], unique=False)
+
+    with op.batch_alter_table('slide', schema=None) as batch_op:
+        batch_op.create_index('ix_slide_chapter_active_order', ['chapter_id', 'is_active', 'order'], unique=False)
+
+    with op.batch_alter_table('activity', schema=None) as batch_op:
+        batch_op.create_index('ix_activity_created_at', ['created_at'], unique=False)
+        batch_op.create_index('ix_activity_user_created', ['user_id', 'created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('activity', schema=None) as batch_op:
+        batch_op.drop_index('ix_activity_user_created')
+        batch_op.drop_index('ix_activity_created_at')
+
+    with op.batch_alter_table('slide', schema=None) as batch_op:
+        batch_op.drop_index('ix_slide_chapter_active_order')
+
+    with op.batch_alter_table('chapter', schema=None) as batch_op:
+        batch_op.drop_index('ix_chapter_active_order')
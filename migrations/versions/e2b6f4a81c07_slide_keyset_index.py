@@ -0,0 +1,29 @@
+"""slide keyset index
+
+Revision ID: e2b6f4a81c07
+Revises: d4a7b2e9f160
+Create Date: 2026-10-18 19:02:41.316205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b6f4a81c07'
+down_revision = 'd4a7b2e9f160'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('slide', schema=None) as batch_op:
+        batch_op.drop_index('ix_slide_chapter_active_order')
+        batch_op.create_index('ix_slide_chapter_active_order_id', ['chapter_id', 'is_active', 'order', 'id'],
+                              unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('slide', schema=None) as batch_op:
+        batch_op.drop_index('ix_slide_chapter_active_order_id')
+        batch_op.create_index('ix_slide_chapter_active_order', ['chapter_id', 'is_active', 'order'], unique=False)
@@ -1,107 +0,0 @@
-"""initial migration
-
-Revision ID: e4f0e8352475
-Revises: 
-Create Date: 2025-08-22 03:09:14.446864
-
-"""
-from alembic import op
-import sqlalchemy as sa
-
-
-# revision identifiers, used by Alembic.
-revision = 'e4f0e8352475'
-down_revision = None
-branch_labels = None
-depends_on = None
-
-
-def upgrade():
-    # ### commands auto generated by Alembic - please adjust! ###
-    op.create_table('chapter',
-    sa.Column('id', sa.Integer(), nullable=False),
-    sa.Column('title_en', sa.String(length=200), nullable=False),
-    sa.Column('title_ckb', sa.String(length=200), nullable=False),
-    sa.Column('description_en', sa.Text(), nullable=True),
-    sa.Column('description_ckb', sa.Text(), nullable=True),
-    sa.Column('icon', sa.String(length=50), nullable=True),
-    sa.Column('order', sa.Integer(), nullable=True),
-    sa.Column('created_at', sa.DateTime(), nullable=True),
-    sa.Column('updated_at', sa.DateTime(), nullable=True),
-    sa.Column('view_count', sa.Integer(), nullable=True),
-    sa.Column('is_active', sa.Boolean(), nullable=True),
-    sa.PrimaryKeyConstraint('id'),
-    sa.UniqueConstraint('order')
-    )
-    op.create_table('system_stats',
-    sa.Column('id', sa.Integer(), nullable=False),
-    sa.Column('date', sa.Date(), nullable=True),
-    sa.Column('total_views', sa.Integer(), nullable=True),
-    sa.Column('chapter_views', sa.Integer(), nullable=True),
-    sa.Column('slide_views', sa.Integer(), nullable=True),
-    sa.Column('active_users', sa.Integer(), nullable=True),
-    sa.Column('created_at', sa.DateTime(), nullable=True),
-    sa.PrimaryKeyConstraint('id'),
-    sa.UniqueConstraint('date')
-    )
-    op.create_table('slide',
-    sa.Column('id', sa.Integer(), nullable=False),
-    sa.Column('title_en', sa.String(length=200), nullable=False),
-    sa.Column('title_ckb', sa.String(length=200), nullable=False),
-    sa.Column('content_en', sa.Text(), nullable=True),
-    sa.Column('content_ckb', sa.Text(), nullable=True),
-    sa.Column('image_url', sa.String(length=500), nullable=True),
-    sa.Column('image_filename', sa.String(length=255), nullable=True),
-    sa.Column('thumbnail_filename', sa.String(length=255), nullable=True),
-    sa.Column('order', sa.Integer(), nullable=True),
-    sa.Column('chapter_id', sa.Integer(), nullable=False),
-    sa.Column('components', sa.Text(), nullable=True),
-    sa.Column('location', sa.Text(), nullable=True),
-    sa.Column('functions', sa.Text(), nullable=True),
-    sa.Column('created_at', sa.DateTime(), nullable=True),
-    sa.Column('updated_at', sa.DateTime(), nullable=True),
-    sa.Column('view_count', sa.Integer(), nullable=True),
-    sa.Column('is_active', sa.Boolean(), nullable=True),
-    sa.ForeignKeyConstraint(['chapter_id'], ['chapter.id'], ),
-    sa.PrimaryKeyConstraint('id')
-    )
-    op.create_table('user',
-    sa.Column('id', sa.Integer(), nullable=False),
-    sa.Column('username', sa.String(length=80), nullable=False),
-    sa.Column('email', sa.String(length=120), nullable=False),
-    sa.Column('password_hash', sa.String(length=255), nullable=False),
-    sa.Column('role', sa.String(length=20), nullable=True),
-    sa.Column('chapter_id', sa.Integer(), nullable=True),
-    sa.Column('created_at', sa.DateTime(), nullable=True),
-    sa.Column('updated_at', sa.DateTime(), nullable=True),
-    sa.Column('last_login', sa.DateTime(), nullable=True),
-    sa.Column('is_active', sa.Boolean(), nullable=True),
-    sa.ForeignKeyConstraint(['chapter_id'], ['chapter.id'], ),
-    sa.PrimaryKeyConstraint('id'),
-    sa.UniqueConstraint('email'),
-    sa.UniqueConstraint('username')
-    )
-    op.create_table('activity',
-    sa.Column('id', sa.Integer(), nullable=False),
-    sa.Column('user_id', sa.Integer(), nullable=False),
-    sa.Column('action', sa.String(length=50), nullable=False),
-    sa.Column('target_type', sa.String(length=20), nullable=False),
-    sa.Column('target_id', sa.Integer(), nullable=False),
-    sa.Column('description', sa.Text(), nullable=True),
-    sa.Column('ip_address', sa.String(length=50), nullable=True),
-    sa.Column('user_agent', sa.String(length=500), nullable=True),
-    sa.Column('created_at', sa.DateTime(), nullable=True),
-    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
-    sa.PrimaryKeyConstraint('id')
-    )
-    # ### end Alembic commands ###
-
-
-def downgrade():
-    # ### commands auto generated by Alembic - please adjust! ###
-    op.drop_table('activity')
-    op.drop_table('user')
-    op.drop_table('slide')
-    op.drop_table('system_stats')
-    op.drop_table('chapter')
-    # ### end Alembic commands ###
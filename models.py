@@ -1,28 +1,48 @@
-from flask_sqlalchemy import SQLAlchemy
+import json
+from datetime import datetime
+
+from flask import url_for
 from flask_login import UserMixin
+from markupsafe import Markup, escape
 from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime
 
-db = SQLAlchemy()
+from extensions import db
+
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
+    email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(255), nullable=False)
-    role = db.Column(db.String(20), nullable=False, default='chapter_admin')
-    chapter_id = db.Column(db.Integer, db.ForeignKey('chapter.id'))
+    role = db.Column(db.String(20), default='chapter_admin')
+    chapter_id = db.Column(db.Integer, db.ForeignKey('chapter.id'), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     last_login = db.Column(db.DateTime)
     is_active = db.Column(db.Boolean, default=True)
 
-    def set_password(self, password: str) -> None:
+    chapter = db.relationship('Chapter', backref='assigned_user', foreign_keys=[chapter_id])
+
+    def set_password(self, password):
         self.password_hash = generate_password_hash(password)
 
-    def check_password(self, password: str) -> bool:
+    def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
+    @property
+    def is_super_admin(self):
+        return self.role == 'super_admin'
+
+    @property
+    def is_admin(self):
+        return self.role in ['super_admin', 'chapter_admin']
+
+
 class Chapter(db.Model):
+    __table_args__ = (
+        db.Index('ix_chapter_active_order', 'is_active', 'order'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     title_en = db.Column(db.String(200), nullable=False)
     title_ckb = db.Column(db.String(200), nullable=False)
@@ -34,19 +54,186 @@ class Chapter(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     view_count = db.Column(db.Integer, default=0)
     is_active = db.Column(db.Boolean, default=True)
-    slides = db.relationship('Slide', backref='chapter', lazy=True, cascade='all, delete-orphan')
+    slides = db.relationship('Slide', backref='chapter_ref', lazy='dynamic', cascade='all, delete-orphan')
+
+    def get_title(self, lang='en'):
+        return self.title_ckb if lang == 'ckb' else self.title_en
+
+    def get_description(self, lang='en'):
+        return self.description_ckb if lang == 'ckb' else self.description_en
+
+    def get_slides_count(self):
+        if getattr(self, '_slide_stats', None) is not None:
+            return self._slide_stats[0]
+        return self.slides.count()
+
+    def get_total_views(self):
+        if getattr(self, '_slide_stats', None) is not None:
+            return (self.view_count or 0) + self._slide_stats[1]
+        slide_views = db.session.query(db.func.sum(Slide.view_count)).filter_by(chapter_id=self.id).scalar() or 0
+        return (self.view_count or 0) + slide_views
+
 
 class Slide(db.Model):
+    __table_args__ = (
+        # chapter pages: WHERE chapter_id = ? AND is_active = 1 AND ("order", id) > (?, ?) ORDER BY "order", id
+        db.Index('ix_slide_chapter_active_order_id', 'chapter_id', 'is_active', 'order', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     title_en = db.Column(db.String(200), nullable=False)
     title_ckb = db.Column(db.String(200), nullable=False)
     content_en = db.Column(db.Text)
     content_ckb = db.Column(db.Text)
+    image_url = db.Column(db.String(500))
+    image_filename = db.Column(db.String(255))
+    thumbnail_filename = db.Column(db.String(255))
     order = db.Column(db.Integer, default=1)
     chapter_id = db.Column(db.Integer, db.ForeignKey('chapter.id'), nullable=False)
-    image_url = db.Column(db.String(500))
-    components = db.Column(db.Text)
-    location = db.Column(db.Text)
-    functions = db.Column(db.Text)
+
+    image_variants = db.Column(db.Text)  # JSON [[width, filename], ...] for srcset
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     view_count = db.Column(db.Integer, default=0)
-    is_active = db.Column(db.Boolean, default=True)
\ No newline at end of file
+    is_active = db.Column(db.Boolean, default=True)
+
+    # Dynamic sections with custom names and bullet points; pages that show
+    # many slides load them with selectinload(Slide.sections)
+    sections = db.relationship('SlideSection', backref='slide', order_by='SlideSection.position',
+                               cascade='all, delete-orphan')
+
+    def get_title(self, lang='en'):
+        return self.title_ckb if lang == 'ckb' else self.title_en
+
+    def get_content(self, lang='en'):
+        return self.content_ckb if lang == 'ckb' else self.content_en
+
+    def get_image_url(self):
+        """Get the image URL, prioritizing uploaded image over external URL"""
+        if self.image_filename:
+            return url_for('media.uploaded_file', filename=f'slides/{self.image_filename}')
+        return self.image_url
+
+    def get_thumbnail_url(self):
+        """Get thumbnail URL if available"""
+        if self.thumbnail_filename:
+            return url_for('media.uploaded_file', filename=f'thumbnails/{self.thumbnail_filename}')
+        return self.get_image_url()
+
+    def get_image_variants(self):
+        """Width/filename pairs of the responsive copies of the uploaded image"""
+        if self.image_filename and self.image_variants:
+            try:
+                return json.loads(self.image_variants)
+            except ValueError:
+                return []
+        return []
+
+    def get_image_srcset(self, thumbnail=False):
+        """srcset value listing every responsive copy, or '' if there are none.
+
+        With ``thumbnail`` the 300px thumbnail (see create_thumbnail) is the
+        smallest candidate, so small cards on phones don't fetch a 640w copy.
+        """
+        candidates = [f"{url_for('media.uploaded_file', filename=f'slides/{name}')} {width}w"
+                      for width, name in self.get_image_variants()]
+        if thumbnail and candidates and self.thumbnail_filename:
+            candidates.insert(0, f"{self.get_thumbnail_url()} 300w")
+        return ', '.join(candidates)
+
+    def responsive_image_attrs(self, sizes='100vw', thumbnail=False):
+        """srcset/sizes attributes for an <img> showing this slide's image"""
+        srcset = self.get_image_srcset(thumbnail)
+        if not srcset:
+            return Markup('')
+        return Markup(f' srcset="{escape(srcset)}" sizes="{escape(sizes)}"')
+
+    def get_dynamic_sections(self):
+        """Sections as [{'name': ..., 'bullets': [...]}, ...] in display order"""
+        return [section.to_dict() for section in self.sections]
+
+    def set_dynamic_sections(self, sections):
+        """Replace the sections with a list of {'name', 'bullets'} dicts"""
+        self.sections = [
+            SlideSection(position=position, name=str(section.get('name', '')).strip(),
+                         bullets=[SectionBullet(position=index, text=str(bullet).strip())
+                                  for index, bullet in enumerate(section.get('bullets', []))
+                                  if str(bullet).strip()])
+            for position, section in enumerate(sections or [])
+            if isinstance(section, dict)
+        ]
+
+
+# Sort key of the slides of a chapter; id breaks ties so it is unique (see pagination.py)
+SLIDE_ORDER = (Slide.order, Slide.id)
+
+
+class SlideSection(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    slide_id = db.Column(db.Integer, db.ForeignKey('slide.id'), nullable=False, index=True)
+    position = db.Column(db.Integer, nullable=False, default=0)
+    name = db.Column(db.String(200))
+
+    # Bullets always come along in one batched query per set of sections
+    bullets = db.relationship('SectionBullet', backref='section', order_by='SectionBullet.position',
+                              cascade='all, delete-orphan', lazy='selectin')
+
+    def to_dict(self):
+        return {'name': self.name or '', 'bullets': [bullet.text for bullet in self.bullets]}
+
+
+class SectionBullet(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    section_id = db.Column(db.Integer, db.ForeignKey('slide_section.id'), nullable=False, index=True)
+    position = db.Column(db.Integer, nullable=False, default=0)
+    text = db.Column(db.Text, nullable=False)
+
+
+class Activity(db.Model):
+    __table_args__ = (
+        db.Index('ix_activity_created_at', 'created_at'),
+        db.Index('ix_activity_user_created', 'user_id', 'created_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    action = db.Column(db.String(50), nullable=False)
+    target_type = db.Column(db.String(20), nullable=False)
+    target_id = db.Column(db.Integer, nullable=False)
+    description = db.Column(db.Text)
+    ip_address = db.Column(db.String(50))
+    user_agent = db.Column(db.String(500))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    user = db.relationship('User', backref='activities')
+
+
+class SystemStats(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    date = db.Column(db.Date, default=datetime.utcnow().date, unique=True)
+    total_views = db.Column(db.Integer, default=0)
+    chapter_views = db.Column(db.Integer, default=0)
+    slide_views = db.Column(db.Integer, default=0)
+    active_users = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class ImageJob(db.Model):
+    id = db.Column(db.String(32), primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # upload / crop
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    payload = db.Column(db.Text, nullable=False)  # JSON task arguments
+    result = db.Column(db.Text)  # JSON task result
+    error = db.Column(db.Text)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def get_result(self):
+        return json.loads(self.result) if self.result else {}
+
+
+class ContentVersion(db.Model):
+    scope = db.Column(db.String(64), primary_key=True)  # chapters / slides / chapter-<id> / slide-<id>
+    version = db.Column(db.BigInteger, nullable=False, default=0)  # time_ns of the last edit
@@ -0,0 +1,86 @@
+"""Per-chapter bundles for reading a chapter without a connection.
+
+A bundle lists every URL the chapter needs offline: the chapter page (every
+page of it for long chapters), its slide pages, their images and
+thumbnails, and the page shell (site.js, the fonts in ``static/fonts`` and
+``OFFLINE_EXTERNAL_ASSETS``).  Each URL comes with a revision.
+static/js/site.js saves the bundle into Cache Storage and, on later visits,
+fetches only the URLs whose revision changed and drops the ones that are
+gone; static/js/sw.js answers requests from those caches when the network
+is unavailable.
+
+Pages are revised by the content versions (content_version.py) they are
+built from: ``'chapters'`` (the menu) plus ``'slide-<id>'`` for a slide
+page or ``'chapter-<id>'`` for the chapter pages, so only edits count and
+views don't.  Uploaded files are content-addressed or fingerprinted, so
+their URL is their revision.  Every page revision also covers the templates
+and static files the running release was started with.  A slide page links
+to its neighbours; a renamed neighbour shows up in the offline copy once
+that slide page itself changes.
+"""
+import hashlib
+import os
+
+from flask import current_app, url_for
+
+from extensions import content_versions
+from models import SLIDE_ORDER
+from pagination import page_cursors
+from static_export import files_digest, files_mtime
+
+# Digest and newest mtime of the templates and static files, computed once per process
+_release = {}
+
+
+def release_digest():
+    digest = _release.get('digest')
+    if digest is None:
+        digest = _release['digest'] = files_digest(current_app).hexdigest()
+    return digest
+
+
+def release_time():
+    mtime = _release.get('mtime')
+    if mtime is None:
+        mtime = _release['mtime'] = files_mtime(current_app)
+    return mtime
+
+
+def _revision(*parts):
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()[:16]
+
+
+def shell_urls():
+    """URLs every offline page needs besides its own content"""
+    urls = [url_for('static', filename='js/site.js')]
+    fonts = os.path.join(current_app.static_folder, 'fonts')
+    if os.path.isdir(fonts):
+        urls += [url_for('static', filename=f'fonts/{name}') for name in sorted(os.listdir(fonts))]
+    return urls + list(current_app.config['OFFLINE_EXTERNAL_ASSETS'])
+
+
+def chapter_bundle(chapter, slides, lang):
+    """``{'chapter_id', 'lang', 'version', 'entries': {url: revision}}`` for
+    ``chapter``, whose active ``slides`` are given in ``SLIDE_ORDER``"""
+    release = release_digest()
+    entries = {url: '' for url in shell_urls()}
+    # One query for every version the revisions below read
+    content_versions.token('chapters', f'chapter-{chapter.id}', *[f'slide-{slide.id}' for slide in slides])
+    chapter_revision = _revision(release, content_versions.token('chapters', f'chapter-{chapter.id}'))
+    entries[url_for('public.chapter', lang=lang, chapter_id=chapter.id)] = chapter_revision
+    # Offline the scroll API is out of reach, so the page links for the later slides are saved too
+    for cursor in page_cursors(slides, SLIDE_ORDER, current_app.config['SLIDES_PER_PAGE']):
+        entries[url_for('public.chapter', lang=lang, chapter_id=chapter.id, cursor=cursor)] = chapter_revision
+    for slide in slides:
+        entries[url_for('public.slide_detail', lang=lang, slide_id=slide.id)] = _revision(
+            release, content_versions.token('chapters', f'slide-{slide.id}'))
+        # The page <img> may pick any srcset width; sw.js falls back to the full image
+        for url in (slide.get_thumbnail_url(), slide.get_image_url()):
+            if url:
+                entries.setdefault(url, '')
+    return {
+        'chapter_id': chapter.id,
+        'lang': lang,
+        'version': _revision(sorted(entries.items())),
+        'entries': entries,
+    }
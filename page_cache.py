@@ -0,0 +1,202 @@
+"""In-process full-page cache for anonymous public pages.
+
+Entries are keyed by (endpoint, view args, the query args the view reads)
+and remember the content-version scopes the page was built from.  Other
+query args (tracking parameters, cache busters) share the entry, so they
+cannot fill the cache with copies of one page.  A lookup only hits when
+those versions are unchanged, so editing a chapter or slide invalidates
+exactly the pages that showed it.  Views must call :meth:`PageCache.track`
+for a scope *before* reading the data it covers, so an edit that lands
+mid-render leaves the entry with an already outdated version.  Entries are evicted least-recently-used
+once the cached bodies exceed ``PAGE_CACHE_MAX_BYTES``.
+
+:class:`FragmentCache` does the same for pieces of markup that every page
+of a language repeats, so signed-in users, whose pages are never cached
+whole, do not rebuild them on each request either.
+"""
+import threading
+from collections import OrderedDict
+
+from flask import Response, g, request, session
+
+
+class PageCache:
+    def __init__(self, app=None, versions=None, bypass=None):
+        self.versions = None
+        self.bypass = bypass
+        self.enabled = True
+        self.max_bytes = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app, versions, bypass)
+
+    def init_app(self, app, versions, bypass=None):
+        app.config.setdefault('PAGE_CACHE_ENABLED', True)
+        app.config.setdefault('PAGE_CACHE_MAX_BYTES', 64 * 1024 * 1024)
+        self.versions = versions
+        if bypass is not None:
+            self.bypass = bypass
+        self.enabled = app.config['PAGE_CACHE_ENABLED']
+        self.max_bytes = int(app.config['PAGE_CACHE_MAX_BYTES'])
+        app.extensions['page_cache'] = self
+
+    def _key(self, args):
+        return (request.endpoint,
+                tuple(sorted((request.view_args or {}).items())),
+                tuple((name, tuple(request.args.getlist(name))) for name in sorted(args)))
+
+    def _cacheable(self):
+        if not self.enabled or request.method != 'GET':
+            return False
+        # Pages carrying flashed messages are one-off renders
+        if session.get('_flashes'):
+            return False
+        return not (self.bypass and self.bypass())
+
+    def lookup(self, *scopes, args=()):
+        """Cached response for the current request, or None.
+
+        ``scopes`` are tracked as with :meth:`track`; ``args`` names the query
+        args the view reads, the only ones that tell cached pages apart.
+        Whether :meth:`store` may cache this request is decided here, because
+        rendering consumes any flashed messages.
+        """
+        g._page_cacheable = self._cacheable()
+        g._page_scopes = []
+        g._page_key = None
+        if not g._page_cacheable:
+            return None
+        self.track(*scopes)
+
+        key = g._page_key = self._key(args)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        versions, body = entry
+        if any(self.versions.get(scope) != version for scope, version in versions):
+            self._discard(key, entry)
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        response = Response(body, mimetype='text/html')
+        response.headers['X-Page-Cache'] = 'HIT'
+        return response
+
+    def track(self, *scopes):
+        """Record the current version of ``scopes`` for the page being built."""
+        if g.get('_page_cacheable', False):
+            g._page_scopes.extend((scope, self.versions.get(scope)) for scope in scopes)
+
+    def store(self, html):
+        """Turn rendered ``html`` into a response, caching it under the tracked scopes."""
+        response = Response(html, mimetype='text/html')
+        if not g.get('_page_cacheable', False):
+            return response
+
+        self._put(g._page_key, tuple(g._page_scopes), response.get_data())
+        response.headers['X-Page-Cache'] = 'MISS'
+        return response
+
+    def store_stream(self, chunks):
+        """Stream ``chunks`` of HTML to the client as they are produced, caching
+        the page under the tracked scopes once the last chunk has been sent."""
+        if not g.get('_page_cacheable', False):
+            return Response(chunks, mimetype='text/html')
+
+        key, scopes = g._page_key, tuple(g._page_scopes)
+
+        def generate():
+            sent = []
+            for chunk in chunks:
+                sent.append(chunk)
+                yield chunk
+            self._put(key, scopes, ''.join(sent).encode('utf-8'))
+
+        response = Response(generate(), mimetype='text/html')
+        response.headers['X-Page-Cache'] = 'MISS'
+        return response
+
+    def _put(self, key, scopes, body):
+        if len(body) > self.max_bytes:
+            return
+        entry = (scopes, body)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old[1])
+            self._entries[key] = entry
+            self._size += len(body)
+            while self._size > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted[1])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._size,
+                    'hits': self.hits, 'misses': self.misses}
+
+    def _discard(self, key, entry):
+        with self._lock:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+                self._size -= len(entry[1])
+
+
+class FragmentCache:
+    """Rendered template fragments keyed by name and language.
+
+    Templates wrap a fragment in a call block naming the content-version
+    scopes it is built from::
+
+        {% call cached_fragment('nav_chapters', lang, 'chapters') %}...{% endcall %}
+
+    There is one entry per fragment and language, replaced when a scope's
+    version changes.
+    """
+
+    def __init__(self, app=None, versions=None):
+        self.versions = None
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._entries = {}
+        if app is not None:
+            self.init_app(app, versions)
+
+    def init_app(self, app, versions):
+        app.config.setdefault('FRAGMENT_CACHE_ENABLED', True)
+        self.versions = versions
+        self.enabled = app.config['FRAGMENT_CACHE_ENABLED']
+        app.jinja_env.globals['cached_fragment'] = self.render
+        app.extensions['fragment_cache'] = self
+
+    def render(self, name, lang, *scopes, caller):
+        # Versions are read before rendering, as for PageCache.track
+        token = self.versions.token(*scopes)
+        key = (name, lang)
+        entry = self._entries.get(key)
+        if self.enabled and entry is not None and entry[0] == token:
+            return entry[1]
+        markup = caller()
+        if self.enabled:
+            with self._lock:
+                self._entries[key] = (token, markup)
+        return markup
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,71 @@
+"""Keyset pagination for ordered listings.
+
+A page is addressed by a cursor holding the sort key of the row next to it
+(``"<order>.<id>"`` for slides) instead of an OFFSET: the database seeks
+straight to the key through the index, so the 40th page costs as much as
+the first, and a page does not shift when rows are added in front of it.
+The sort columns must end in a unique column so every row has its own key.
+"""
+from extensions import db
+
+
+class KeysetPage:
+    """One page of rows; the cursors are None where there is nothing further"""
+    __slots__ = ('items', 'next_cursor', 'prev_cursor')
+
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+
+def encode_cursor(values):
+    return '.'.join(str(value) for value in values)
+
+
+def decode_cursor(cursor, columns):
+    """Key values from a cursor, or None for a missing or malformed one"""
+    if not cursor:
+        return None
+    try:
+        values = tuple(int(value) for value in cursor.split('.'))
+    except ValueError:
+        return None
+    return values if len(values) == len(columns) else None
+
+
+def row_key(row, columns):
+    return tuple(getattr(row, column.key) for column in columns)
+
+
+def keyset_page(query, columns, limit, after=None, before=None):
+    """Up to ``limit`` rows of ``query`` in ``columns`` order, following the
+    key ``after`` or, when going back, preceding the key ``before``"""
+    key = db.tuple_(*columns)
+    if before is not None:
+        rows = query.filter(key < db.tuple_(*before)).order_by(*[column.desc() for column in columns]) \
+            .limit(limit + 1).all()
+        items = rows[:limit][::-1]
+        has_prev, has_next = len(rows) > limit, True
+    else:
+        if after is not None:
+            query = query.filter(key > db.tuple_(*after))
+        rows = query.order_by(*columns).limit(limit + 1).all()
+        items = rows[:limit]
+        has_prev, has_next = after is not None, len(rows) > limit
+
+    if not items:
+        return KeysetPage(items)
+    return KeysetPage(items,
+                      next_cursor=encode_cursor(row_key(items[-1], columns)) if has_next else None,
+                      prev_cursor=encode_cursor(row_key(items[0], columns)) if has_prev else None)
+
+
+def page_cursors(rows, columns, limit):
+    """Cursors of every page after the first, for ``rows`` already in ``columns`` order"""
+    return [encode_cursor(row_key(rows[end - 1], columns)) for end in range(limit, len(rows), limit)]
+
+
+def count_before(query, columns, key):
+    """Number of rows of ``query`` sorting before ``key``, for numbering a page"""
+    return query.filter(db.tuple_(*columns) < db.tuple_(*key)).order_by(None).count()
@@ -0,0 +1,327 @@
+"""Public pages: home, chapter and slide pages, the study guide and search."""
+import hashlib
+from datetime import datetime, timezone
+
+from flask import (Blueprint, Response, abort, current_app, redirect, render_template, request, send_from_directory, session,
+                   stream_template, url_for)
+from flask_login import current_user
+from sqlalchemy.orm import selectinload
+
+from extensions import catalogs, content_versions, db, page_cache, slide_search, view_counter
+from i18n import pick_lang
+from models import SLIDE_ORDER, Chapter, Slide
+from offline import release_digest, release_time
+from pagination import count_before, decode_cursor, keyset_page, row_key
+from stats import enhance_chapters, log_activity, with_chapter_stats
+
+bp = Blueprint('public', __name__)
+
+
+# فلتەری nl2br بۆ گۆڕینی \n بۆ <br>
+@bp.app_template_filter('nl2br')
+def nl2br_filter(s):
+    if s is None:
+        return ""
+    return s.replace('\n', '<br>\n')
+
+
+class NavChapter:
+    """Read-only snapshot of a Chapter for the navigation menu.
+
+    Plain attributes only, so it can be kept across requests without being
+    tied to a database session.
+    """
+    __slots__ = ('id', 'order', 'icon', 'title_en', 'title_ckb', 'description_en', 'description_ckb')
+
+    def __init__(self, chapter):
+        for name in self.__slots__:
+            setattr(self, name, getattr(chapter, name))
+
+    def get_title(self, lang='en'):
+        return self.title_ckb if lang == 'ckb' else self.title_en
+
+    def get_description(self, lang='en'):
+        return self.description_ckb if lang == 'ckb' else self.description_en
+
+
+# Navigation is rebuilt only when the 'chapters' content version changes
+_nav_cache = {'entry': (None, [])}
+
+
+def get_nav_chapters():
+    """Active chapters for navigation, served from memory until content changes"""
+    version = content_versions.get('chapters')
+    cached_version, nav_chapters = _nav_cache['entry']
+    if cached_version != version:
+        nav_chapters = [NavChapter(c) for c in
+                        Chapter.query.filter_by(is_active=True).order_by(Chapter.order).all()]
+        _nav_cache['entry'] = (version, nav_chapters)
+    return nav_chapters
+
+
+def is_active_chapter(chapter_id):
+    """Whether ``chapter_id`` is an active chapter, from the navigation snapshot"""
+    return any(chapter.id == chapter_id for chapter in get_nav_chapters())
+
+
+@bp.app_context_processor
+def inject_globals():
+    lang = request.view_args.get('lang', 'en') if request.view_args else 'en'
+    catalog = catalogs.get(lang)
+    chapters = get_nav_chapters()
+    return dict(t=catalog.strings, lang=lang, lang_code=catalog.code, text_dir=catalog.direction,
+                languages=catalogs.languages, chapters=chapters)
+
+
+# slide id -> chapter id; a slide never moves between chapters
+_slide_chapter_ids = {}
+
+
+def public_validators(*scopes):
+    """ETag and Last-Modified for an anonymous public page built from ``scopes``.
+
+    Returns None for signed-in users and for requests with pending flash
+    messages, whose pages must always be rendered.
+    """
+    if current_user.is_authenticated or session.get('_flashes'):
+        return None
+    versions = content_versions.token(*scopes)
+    # The release covers the templates and static files, so a deploy that
+    # changes the markup does not keep answering 304 to old copies
+    payload = f"{release_digest()}|{request.endpoint}|{sorted((request.view_args or {}).items())}|{versions}"
+    etag = hashlib.sha1(payload.encode('utf-8')).hexdigest()
+    newest = max(max(versions, default=0) // 10 ** 9, int(release_time()))
+    last_modified = datetime.fromtimestamp(newest, tz=timezone.utc) if newest else None
+    return etag, last_modified
+
+
+def not_modified(validators):
+    """A 304 response if the client's validators still match, otherwise None"""
+    if validators is None:
+        return None
+    etag, last_modified = validators
+    if request.if_none_match:
+        fresh = request.if_none_match.contains(etag)
+    else:
+        fresh = bool(last_modified and request.if_modified_since
+                     and request.if_modified_since >= last_modified)
+    if not fresh:
+        return None
+    return with_validators(Response(status=304), validators)
+
+
+def with_validators(response, validators):
+    """Attach ETag/Last-Modified so browsers revalidate instead of re-downloading"""
+    if validators is not None:
+        etag, last_modified = validators
+        response.set_etag(etag)
+        if last_modified:
+            response.last_modified = last_modified
+        response.cache_control.no_cache = True
+    return response
+
+
+def count_view(kind, target_id):
+    """Count a page view, unless the page is being saved for offline reading"""
+    if not request.headers.get('X-Offline-Download'):
+        view_counter.increment(kind, target_id)
+
+
+@bp.route("/sw.js")
+def service_worker():
+    """The service worker, served from the root so its scope covers the whole site"""
+    response = send_from_directory(current_app.static_folder, 'js/sw.js', max_age=0)
+    response.cache_control.no_cache = True
+    return response
+
+
+@bp.route("/")
+def root():
+    """Redirect to English by default"""
+    return redirect(url_for("public.index", lang="en"))
+
+
+# Chapters of the study guide in reading order, each in templates/guide/<name>.html
+GUIDE_SECTIONS = ('histology', 'embryology', 'plant-biology', 'parasitology',
+                  'hematology', 'microbiology', 'entomology', 'algae')
+
+
+@bp.route("/guide/<lang>")
+def guide(lang):
+    """The study guide, streamed: the page shell and first chapter go out at
+    once and the browser fetches the other chapters while the reader scrolls"""
+    cached = page_cache.lookup('chapters')
+    if cached is not None:
+        return cached
+    return page_cache.store_stream(stream_template("guide.html", lang=lang, sections=GUIDE_SECTIONS,
+                                                   inline_sections=current_app.config['GUIDE_INLINE_SECTIONS']))
+
+
+@bp.route("/guide/<lang>/section/<section>")
+def guide_section(lang, section):
+    """One chapter of the study guide as an HTML fragment"""
+    if section not in GUIDE_SECTIONS:
+        # Not abort(404): the 404 handler redirects to a full page
+        return Response(status=404)
+    cached = page_cache.lookup('chapters')
+    if cached is not None:
+        return cached
+    return page_cache.store(render_template(f"guide/{section}.html", lang=lang))
+
+
+@bp.route("/<lang>")
+def index(lang):
+    """Main homepage - data comes directly from database"""
+    lang, t, lang_code = pick_lang(lang)
+    cached = page_cache.lookup('chapters', 'slides')
+    if cached is not None:
+        return cached
+
+    chapters = with_chapter_stats(Chapter.query.filter_by(is_active=True).order_by(Chapter.order).all())
+
+    # Pass chapters to template
+    return page_cache.store(render_template("index.html", t=t, lang=lang, lang_code=lang_code, chapters=chapters))
+
+
+@bp.route("/<lang>/chapters")
+def chapters(lang):
+    """Chapters overview page - data from database"""
+    lang, t, lang_code = pick_lang(lang)
+    cached = page_cache.lookup('chapters', 'slides')
+    if cached is not None:
+        return cached
+
+    chapters_query = Chapter.query.filter_by(is_active=True).order_by(Chapter.order).all()
+
+    # Create consistent data structure that matches template expectations
+    enhanced_chapters = enhance_chapters(chapters_query)
+
+    return page_cache.store(render_template("chapters.html", t=t, lang=lang, lang_code=lang_code,
+                                            chapters=enhanced_chapters))
+
+def chapter_slides_page(chapter_id, after=None, limit=None):
+    """A page of a chapter's active slides following the cursor ``after``,
+    and the position in the chapter of its first slide"""
+    query = Slide.query.filter_by(chapter_id=chapter_id, is_active=True)
+    key = decode_cursor(after, SLIDE_ORDER)
+    page = keyset_page(query.options(selectinload(Slide.sections)), SLIDE_ORDER,
+                       limit or current_app.config['SLIDES_PER_PAGE'], after=key)
+    first_number = 1
+    if key is not None and page.items:
+        first_number += count_before(query, SLIDE_ORDER, row_key(page.items[0], SLIDE_ORDER))
+    return page, first_number
+
+
+@bp.route("/<lang>/chapter/<int:chapter_id>")
+@bp.route("/<lang>/chapter/<int:chapter_id>/page/<cursor>/")
+def chapter(lang, chapter_id, cursor=None):
+    """Individual chapter pages - data from database.
+
+    Long chapters continue on ``page/<cursor>/`` URLs, which are plain paths
+    so a static export can hold them as files.
+    """
+    lang, t, lang_code = pick_lang(lang)
+    if cursor is None and request.args.get('after'):
+        # Links from before the page/<cursor>/ form
+        return redirect(url_for('public.chapter', lang=lang, chapter_id=chapter_id,
+                                cursor=request.args['after']), 301)
+    # Before the conditional and cached responses, so they never count views for a missing chapter
+    if not is_active_chapter(chapter_id) or (cursor is not None and decode_cursor(cursor, SLIDE_ORDER) is None):
+        abort(404)
+    validators = public_validators('chapters', f'chapter-{chapter_id}')
+    unchanged = not_modified(validators)
+    if unchanged is not None:
+        count_view('chapter', chapter_id)
+        return unchanged
+
+    cached = page_cache.lookup('chapters', f'chapter-{chapter_id}')
+    if cached is not None:
+        count_view('chapter', chapter_id)
+        return with_validators(cached, validators)
+
+    chapter_obj = Chapter.query.filter_by(id=chapter_id, is_active=True).first_or_404()
+    page, first_number = chapter_slides_page(chapter_id, cursor)
+    # The next chapter in the menu, which site.js saves for offline reading in advance
+    later = [chapter.id for chapter in get_nav_chapters() if chapter.order > chapter_obj.order]
+    next_chapter_id = later[0] if later else None
+    slides_count = Slide.query.filter_by(chapter_id=chapter_id, is_active=True).count()
+
+    # Count the view; the buffer writes it back in a batch later
+    count_view('chapter', chapter_id)
+    log_activity('view', 'chapter', chapter_id, f'Viewed chapter: {chapter_obj.get_title(lang)}')
+
+    response = page_cache.store(render_template("chapter_detail.html", t=t, lang=lang, lang_code=lang_code,
+                                                chapter=chapter_obj, slides=page.items, slides_count=slides_count,
+                                                first_number=first_number, next_cursor=page.next_cursor,
+                                                next_chapter_id=next_chapter_id))
+    return with_validators(response, validators)
+
+
+@bp.route("/<lang>/slide/<int:slide_id>")
+def slide_detail(lang, slide_id):
+    """Individual slide view - data from database"""
+    lang, t, lang_code = pick_lang(lang)
+    chapter_id = _slide_chapter_ids.get(slide_id)
+    if chapter_id is None:
+        chapter_id = db.session.query(Slide.chapter_id).filter_by(id=slide_id).scalar()
+        if chapter_id is not None:
+            _slide_chapter_ids[slide_id] = chapter_id
+    validators = None
+    if chapter_id is not None and is_active_chapter(chapter_id):
+        validators = public_validators('chapters', f'slide-{slide_id}', f'chapter-{chapter_id}')
+    unchanged = not_modified(validators)
+    if unchanged is not None:
+        count_view('slide', slide_id)
+        return unchanged
+
+    cached = page_cache.lookup('chapters', f'slide-{slide_id}')
+    if cached is not None:
+        count_view('slide', slide_id)
+        return with_validators(cached, validators)
+
+    slide_obj = Slide.query.filter_by(id=slide_id, is_active=True).options(
+        selectinload(Slide.sections)
+    ).first_or_404()
+    # The sibling list below depends on the whole chapter
+    page_cache.track(f'chapter-{slide_obj.chapter_id}')
+    chapter_obj = slide_obj.chapter_ref
+
+    # Count the view; the buffer writes it back in a batch later
+    count_view('slide', slide_id)
+    log_activity('view', 'slide', slide_id, f'Viewed slide: {slide_obj.get_title(lang)}')
+
+    # Only a window of neighbours around this slide, however long the chapter
+    siblings = Slide.query.filter_by(chapter_id=chapter_obj.id, is_active=True)
+    key = row_key(slide_obj, SLIDE_ORDER)
+    neighbours = current_app.config['SLIDE_NEIGHBOURS']
+    earlier = keyset_page(siblings, SLIDE_ORDER, neighbours, before=key).items
+    later = keyset_page(siblings, SLIDE_ORDER, neighbours, after=key).items
+
+    response = page_cache.store(render_template("slide_detail.html", t=t, lang=lang, lang_code=lang_code,
+                                                slide=slide_obj, chapter=chapter_obj, other_slides=earlier + later,
+                                                prev_slide=earlier[-1] if earlier else None,
+                                                next_slide=later[0] if later else None))
+    return with_validators(response, validators)
+
+
+def search_hits(query, lang, limit=None):
+    """Search results with the slide URL added to each hit"""
+    hits = slide_search.search(query, lang, limit)
+    for hit in hits:
+        hit['url'] = url_for('public.slide_detail', lang=lang, slide_id=hit['slide_id'])
+    return hits
+
+
+@bp.route("/<lang>/search")
+def search(lang):
+    """Full-text search page over slide titles, content and sections"""
+    lang, t, lang_code = pick_lang(lang)
+    query = request.args.get('q', '').strip()
+    hits = search_hits(query, lang) if query else []
+    return render_template("search.html", t=t, lang=lang, lang_code=lang_code, query=query, hits=hits)
+
+
+@bp.app_errorhandler(404)
+def not_found(error):
+    """Custom 404 error handler"""
+    return redirect(url_for('public.index', lang='en'))
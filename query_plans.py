@@ -0,0 +1,73 @@
+"""``EXPLAIN QUERY PLAN`` and statement-count checks for the hot pages.
+
+``flask check-query-plans`` explains each query against the configured
+SQLite database and reports plans that fall back to a full table scan or
+sort their result in a temporary B-tree, which is what happens when one of
+the composite indexes is missing or stops matching the query.  Walking a
+whole index (``SCAN t USING INDEX``) counts as a full scan too, except for
+queries that are meant to read an index in order and stop at a LIMIT.
+
+``flask check-query-counts`` renders the hot pages and counts the SQL
+statements each one sends, which catches the N+1 pattern (a lazy load per
+row) that a per-query plan cannot show.
+"""
+import re
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+FULL_SCAN_RE = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+INDEX_SCAN_RE = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)? USING (?:COVERING )?INDEX')
+
+
+def explain(conn, statement):
+    """Plan detail lines SQLite reports for ``statement``."""
+    compiled = statement.compile(dialect=conn.dialect, compile_kwargs={'render_postcompile': True})
+    params = []
+    for name in compiled.positiontup or ():
+        value = compiled.params[name]
+        bind = compiled.binds.get(name)
+        processor = bind.type.bind_processor(conn.dialect) if bind is not None else None
+        params.append(processor(value) if processor else value)
+    rows = conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {compiled}', tuple(params)).all()
+    return [row[-1] for row in rows]
+
+
+def plan_problems(plan, index_scan_ok=False):
+    """Full scans and temp-B-tree sorts found in a plan."""
+    problems = []
+    for detail in plan:
+        if FULL_SCAN_RE.match(detail):
+            problems.append(f'full table scan ({detail})')
+        elif INDEX_SCAN_RE.match(detail) and not index_scan_ok:
+            problems.append(f'full index scan ({detail})')
+        elif 'USE TEMP B-TREE FOR ORDER BY' in detail:
+            problems.append(f'sort without an index ({detail})')
+    return problems
+
+
+def check_plans(conn, queries):
+    """Explain every ``(name, statement, index_scan_ok)``.
+
+    Returns ``[(name, plan, problems), ...]``.
+    """
+    results = []
+    for name, statement, index_scan_ok in queries:
+        plan = explain(conn, statement)
+        results.append((name, plan, plan_problems(plan, index_scan_ok)))
+    return results
+
+
+@contextmanager
+def count_statements(engine):
+    """Collect the SQL sent through ``engine`` inside the block into the yielded list."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
@@ -0,0 +1,235 @@
+"""Full-text search over slide content with SQLite FTS5.
+
+Slides are indexed into the ``slide_fts`` virtual table, one row per slide
+(rowid = slide id), with the English and Sorani titles, bodies and the
+section names and bullets.  Text is run through
+:func:`normalize_text` both when indexing and when querying, so the
+Arabic-script variants people actually type (Arabic yeh/kaf, heh + ZWNJ for
+ە, tatweel, Arabic-Indic digits) all match.  Views call :meth:`SlideSearch.index`
+and :meth:`SlideSearch.remove` after committing a slide change.
+
+Databases without FTS5 fall back to a ``LIKE`` scan, ranked by title hits.
+"""
+import logging
+import re
+
+from markupsafe import Markup, escape
+from sqlalchemy import text
+from sqlalchemy.orm import selectinload
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ('title_en', 'title_ckb', 'content_en', 'content_ckb', 'sections')
+# bm25 weights in COLUMNS order: titles count more than body text
+WEIGHTS = (8.0, 8.0, 1.0, 1.0, 2.0)
+
+# Markers snippet() puts around matches; escaped text never contains them
+HIT_START = '\ue000'
+HIT_END = '\ue001'
+
+SORANI_MAP = str.maketrans({
+    'ي': 'ی',  # Arabic yeh -> Farsi yeh
+    'ى': 'ی',  # alef maksura -> Farsi yeh
+    'ك': 'ک',  # Arabic kaf -> keheh
+    'ة': 'ە',  # teh marbuta -> ae
+    '\u0640': None,  # tatweel
+    '\u200d': None,  # zero-width joiner
+    **{chr(0x0660 + i): str(i) for i in range(10)},  # Arabic-Indic digits
+    **{chr(0x06f0 + i): str(i) for i in range(10)},  # Extended Arabic-Indic digits
+})
+ARABIC_MARKS_RE = re.compile('[\u064b-\u065f\u0670]')  # harakat, shadda, superscript alef
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def normalize_text(value):
+    """Fold Sorani spelling variants into one form for indexing and querying"""
+    if not value:
+        return ''
+    value = value.replace('\u0647\u200c', '\u06d5')  # heh + ZWNJ written for ae
+    value = value.replace('\u200c', ' ')  # remaining ZWNJ separates words
+    value = ARABIC_MARKS_RE.sub('', value)
+    return value.translate(SORANI_MAP)
+
+
+def section_text(sections):
+    """Section names and bullets (``get_dynamic_sections()`` form) as plain text"""
+    parts = []
+    for section in sections:
+        parts.append(section['name'])
+        parts.extend(section['bullets'])
+    return '\n'.join(part for part in parts if part)
+
+
+def match_query(query):
+    """FTS5 MATCH expression: every word of ``query`` as a quoted prefix term"""
+    words = WORD_RE.findall(normalize_text(query))
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def highlight(snippet):
+    """Escape a snippet and turn the hit markers into <mark> tags"""
+    html = str(escape(snippet))
+    return Markup(html.replace(HIT_START, '<mark>').replace(HIT_END, '</mark>'))
+
+
+class SlideSearch:
+    table = 'slide_fts'
+
+    def __init__(self, app=None, db=None, model=None):
+        self.db = None
+        self.model = None
+        self.max_results = 50
+        self._available = None
+        if app is not None:
+            self.init_app(app, db, model)
+
+    def init_app(self, app, db, model):
+        app.config.setdefault('SEARCH_MAX_RESULTS', 50)
+        self.db = db
+        self.model = model
+        self.max_results = int(app.config['SEARCH_MAX_RESULTS'])
+        app.extensions['slide_search'] = self
+
+    @property
+    def available(self):
+        """Whether the database supports FTS5 (checked once)"""
+        if self._available is None:
+            if self.db.engine.dialect.name != 'sqlite':
+                self._available = False
+            else:
+                try:
+                    with self.db.engine.connect() as conn:
+                        conn.execute(text('CREATE VIRTUAL TABLE IF NOT EXISTS temp.fts5_probe USING fts5(x)'))
+                        conn.execute(text('DROP TABLE temp.fts5_probe'))
+                    self._available = True
+                except Exception:
+                    logger.warning('SQLite FTS5 is not available, search falls back to LIKE')
+                    self._available = False
+        return self._available
+
+    def create(self):
+        """Create the index table; returns True if it did not exist yet."""
+        if not self.available:
+            return False
+        with self.db.engine.begin() as conn:
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {'name': self.table}
+            ).first()
+            if exists:
+                return False
+            conn.execute(text(
+                f"CREATE VIRTUAL TABLE {self.table} USING fts5("
+                f"{', '.join(COLUMNS)}, tokenize = 'unicode61 remove_diacritics 2')"
+            ))
+        return True
+
+    def ensure(self):
+        """Create and fill the index if it is missing (e.g. on a fresh database)."""
+        if self.create():
+            self.rebuild()
+
+    def rebuild(self):
+        """Re-index every active slide; returns the number indexed."""
+        if not self.available:
+            return 0
+        self.create()
+        slides = self.model.query.filter_by(is_active=True).options(selectinload(self.model.sections)).all()
+        with self.db.engine.begin() as conn:
+            conn.execute(text(f'DELETE FROM {self.table}'))
+            for slide in slides:
+                self._insert(conn, slide)
+        return len(slides)
+
+    def index(self, slide):
+        """Add or refresh one slide (inactive slides are removed)."""
+        if not self.available:
+            return
+        try:
+            with self.db.engine.begin() as conn:
+                conn.execute(text(f'DELETE FROM {self.table} WHERE rowid = :id'), {'id': slide.id})
+                if slide.is_active:
+                    self._insert(conn, slide)
+        except Exception:
+            logger.exception('Could not index slide %s', slide.id)
+
+    def remove(self, slide_id):
+        if not self.available:
+            return
+        try:
+            with self.db.engine.begin() as conn:
+                conn.execute(text(f'DELETE FROM {self.table} WHERE rowid = :id'), {'id': slide_id})
+        except Exception:
+            logger.exception('Could not remove slide %s from the search index', slide_id)
+
+    def search(self, query, lang='en', limit=None):
+        """Ranked hits for ``query`` as dicts with slide/chapter ids, title and snippet."""
+        limit = min(limit or self.max_results, self.max_results)
+        if not WORD_RE.search(normalize_text(query or '')):
+            return []
+        if self.available:
+            try:
+                return self._search_fts(query, lang, limit)
+            except Exception:
+                logger.exception('Full-text search failed for %r', query)
+                return []
+        return self._search_like(query, lang, limit)
+
+    def _insert(self, conn, slide):
+        values = {
+            'id': slide.id,
+            'title_en': normalize_text(slide.title_en),
+            'title_ckb': normalize_text(slide.title_ckb),
+            'content_en': normalize_text(slide.content_en),
+            'content_ckb': normalize_text(slide.content_ckb),
+            'sections': normalize_text(section_text(slide.get_dynamic_sections())),
+        }
+        conn.execute(text(
+            f"INSERT INTO {self.table} (rowid, {', '.join(COLUMNS)}) "
+            f"VALUES (:id, {', '.join(':' + column for column in COLUMNS)})"
+        ), values)
+
+    def _search_fts(self, query, lang, limit):
+        slide_table = self.model.__tablename__
+        chapter_table = self.model.chapter_ref.property.mapper.local_table.name
+        title = 'title_ckb' if lang == 'ckb' else 'title_en'
+        sql = text(
+            f"SELECT s.id, s.chapter_id, s.{title} AS title, "
+            f"snippet({self.table}, -1, :hit_start, :hit_end, ' … ', 16) AS snippet, "
+            f"bm25({self.table}, {', '.join(str(w) for w in WEIGHTS)}) AS rank "
+            f"FROM {self.table} "
+            f"JOIN {slide_table} s ON s.id = {self.table}.rowid "
+            f"JOIN {chapter_table} c ON c.id = s.chapter_id "
+            f"WHERE {self.table} MATCH :query AND s.is_active = 1 AND c.is_active = 1 "
+            f"ORDER BY rank LIMIT :limit"
+        )
+        with self.db.engine.connect() as conn:
+            rows = conn.execute(sql, {'query': match_query(query), 'hit_start': HIT_START,
+                                      'hit_end': HIT_END, 'limit': limit}).all()
+        return [{'slide_id': row.id, 'chapter_id': row.chapter_id, 'title': row.title,
+                 'snippet': highlight(row.snippet), 'score': -row.rank} for row in rows]
+
+    def _search_like(self, query, lang, limit):
+        model = self.model
+        words = WORD_RE.findall(query)
+        columns = (model.title_en, model.title_ckb, model.content_en, model.content_ckb)
+        chapter_model = model.chapter_ref.property.mapper.class_
+        section_model = model.sections.property.mapper.class_
+        bullet_model = section_model.bullets.property.mapper.class_
+        q = model.query.join(model.chapter_ref).filter(model.is_active == True, chapter_model.is_active == True)
+        for word in words:
+            pattern = f'%{word}%'
+            q = q.filter(self.db.or_(
+                *(column.ilike(pattern) for column in columns),
+                model.sections.any(self.db.or_(section_model.name.ilike(pattern),
+                                               section_model.bullets.any(bullet_model.text.ilike(pattern))))
+            ))
+        hits = []
+        for slide in q.limit(limit * 4).all():
+            title = slide.get_title(lang)
+            body = (slide.content_ckb if lang == 'ckb' else slide.content_en) or ''
+            score = sum(word.lower() in (title or '').lower() for word in words)
+            hits.append({'slide_id': slide.id, 'chapter_id': slide.chapter_id, 'title': title,
+                         'snippet': escape(body[:160]), 'score': score})
+        hits.sort(key=lambda hit: -hit['score'])
+        return hits[:limit]
@@ -0,0 +1,260 @@
+"""Bulk slide import from a ZIP archive of images plus a manifest.
+
+The archive holds ``manifest.csv`` or ``manifest.json`` and the images it
+names, with paths relative to the manifest.  Each manifest row is one slide:
+
+    chapter_id, order, title_en, title_ckb, content_en, content_ckb,
+    image, image_url, sections
+
+``chapter_id`` may be left out when a default chapter is given, and
+``order`` to append after the chapter's last slide.  ``sections`` is the
+list of ``{"name": ..., "bullets": [...]}`` the slide editor produces (a
+JSON string in CSV files).
+
+Only the manifest is read into memory.  Images are streamed out of the
+archive one at a time into content-addressed uploads.  All valid rows are
+inserted in one transaction; rows with errors are skipped (or, with
+``strict``, nothing is imported) and reported with their row number.  New
+images are then queued as ``upload`` image jobs, so the import does not wait
+for Pillow: each slide gets its thumbnail and responsive copies from
+:func:`attach_image_variants` once its job is done.  Images of rows that end
+up not imported are left for ``flask uploads-gc``.
+"""
+import csv
+import io
+import json
+import os
+import posixpath
+import zipfile
+from datetime import datetime
+
+from flask import current_app
+
+from extensions import content_versions, db, image_jobs, slide_search
+from image_processing import content_filename, is_processed, save_upload, stored_result
+from media import image_options
+from models import Chapter, Slide
+
+MANIFEST_NAMES = ('manifest.csv', 'manifest.json')
+TEXT_LIMITS = {'title_en': 200, 'title_ckb': 200, 'image_url': 500}
+
+
+class ManifestError(ValueError):
+    """The archive as a whole cannot be imported"""
+
+
+def find_manifest(archive):
+    """Name of the manifest in ``archive``, the one closest to the root"""
+    names = [name for name in archive.namelist() if posixpath.basename(name) in MANIFEST_NAMES]
+    if not names:
+        raise ManifestError('The archive has no manifest.csv or manifest.json')
+    return min(names, key=lambda name: (name.count('/'), name))
+
+
+def read_manifest(archive, name):
+    """``(row number, row dict)`` for every manifest row; CSV rows are numbered by line"""
+    if name.endswith('.csv'):
+        with archive.open(name) as raw:
+            reader = csv.DictReader(io.TextIOWrapper(raw, encoding='utf-8-sig', newline=''))
+            for number, row in enumerate(reader, 2):
+                yield number, row
+        return
+
+    with archive.open(name) as raw:
+        try:
+            rows = json.load(raw)
+        except ValueError as e:
+            raise ManifestError(f'{name} is not valid JSON: {e}')
+    if isinstance(rows, dict):
+        rows = rows.get('slides')
+    if not isinstance(rows, list):
+        raise ManifestError(f'{name} must be a list of slides or {{"slides": [...]}}')
+    for number, row in enumerate(rows, 1):
+        yield number, row if isinstance(row, dict) else None
+
+
+def parse_sections(value):
+    """Dynamic sections from a manifest value; raises ValueError"""
+    if value in (None, ''):
+        return []
+    if isinstance(value, str):
+        value = json.loads(value)
+    if not isinstance(value, list) or not all(isinstance(section, dict) for section in value):
+        raise ValueError('sections must be a list of {"name", "bullets"} objects')
+    for section in value:
+        if not isinstance(section.get('bullets', []), list):
+            raise ValueError('section bullets must be a list')
+    return value
+
+
+def parse_row(row, base_dir, members, chapters, default_chapter_id):
+    """Slide fields for a manifest row and the list of problems with it"""
+    if row is None:
+        return None, ['not an object']
+    text = {key: str(value).strip() for key, value in row.items() if key and value is not None}
+    fields, errors = {}, []
+
+    try:
+        chapter_id = int(text.get('chapter_id') or default_chapter_id)
+    except (TypeError, ValueError):
+        errors.append('chapter_id is missing or not a number')
+    else:
+        if chapter_id in chapters:
+            fields['chapter_id'] = chapter_id
+        else:
+            errors.append(f'no chapter {chapter_id} to add slides to')
+
+    if text.get('order'):
+        try:
+            fields['order'] = int(text['order'])
+        except ValueError:
+            errors.append('order is not a number')
+
+    for key in ('title_en', 'title_ckb', 'content_en', 'content_ckb', 'image_url'):
+        fields[key] = text.get(key, '')
+        if key in TEXT_LIMITS and len(fields[key]) > TEXT_LIMITS[key]:
+            errors.append(f'{key} is longer than {TEXT_LIMITS[key]} characters')
+    for key in ('title_en', 'title_ckb'):
+        if not fields[key]:
+            errors.append(f'{key} is required')
+
+    if text.get('image'):
+        member = posixpath.normpath(posixpath.join(base_dir, text['image']))
+        extension = posixpath.splitext(member)[1].lstrip('.').lower()
+        info = members.get(member)
+        if info is None:
+            errors.append(f"image {text['image']} is not in the archive")
+        elif extension not in current_app.config['ALLOWED_EXTENSIONS']:
+            errors.append(f"image {text['image']} is not an allowed file type")
+        elif info.file_size > current_app.config['MAX_CONTENT_LENGTH']:
+            errors.append(f"image {text['image']} is larger than the upload limit")
+        else:
+            fields['image'] = member
+
+    try:
+        fields['sections'] = parse_sections(row.get('sections'))
+    except ValueError as e:
+        errors.append(f'sections: {e}')
+    return fields, errors
+
+
+def extract_images(archive, rows, upload_folder, options):
+    """Copy each row's image into ``slides/`` under its content address and
+    return the upload jobs for the ones not processed before"""
+    slides_dir = os.path.join(upload_folder, 'slides')
+    uploads = {}
+    for number, fields in rows:
+        member = fields.pop('image', None)
+        if not member:
+            continue
+        with archive.open(member) as stream:
+            temp_path, digest = save_upload(stream, slides_dir)
+        filename = content_filename(digest, posixpath.splitext(member)[1])
+        fields['image_filename'] = filename
+        if filename in uploads or is_processed(upload_folder, filename):
+            os.remove(temp_path)
+        else:
+            uploads[filename] = {'upload_folder': upload_folder, 'source': os.path.basename(temp_path),
+                                 'filename': filename, 'options': options}
+    return uploads
+
+
+def import_archive(archive_file, chapter_id=None, chapter_ids=None, strict=False, user_id=None):
+    """Import the slides of the ZIP ``archive_file`` (a path or a seekable file).
+
+    ``chapter_id`` is the chapter for rows without one, ``chapter_ids``
+    limits the chapters rows may name (None: any active chapter) and
+    ``user_id`` owns the image jobs.  Returns a report dict: ``rows``,
+    ``imported``, ``slide_ids``, ``chapters`` (slides added per chapter),
+    ``job_ids`` (queued image jobs) and ``errors`` (``[{'row', 'errors'}]``).
+    """
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    options = image_options()
+    report = {'rows': 0, 'imported': 0, 'slide_ids': [], 'chapters': {}, 'job_ids': [], 'errors': []}
+    try:
+        archive = zipfile.ZipFile(archive_file)
+    except zipfile.BadZipFile:
+        raise ManifestError('The upload is not a ZIP archive')
+
+    with archive:
+        manifest = find_manifest(archive)
+        members = {info.filename: info for info in archive.infolist() if not info.is_dir()}
+        chapters = {chapter.id: chapter for chapter in Chapter.query.filter_by(is_active=True)
+                    if chapter_ids is None or chapter.id in chapter_ids}
+
+        rows = []
+        for number, row in read_manifest(archive, manifest):
+            report['rows'] += 1
+            fields, errors = parse_row(row, posixpath.dirname(manifest), members, chapters, chapter_id)
+            if errors:
+                report['errors'].append({'row': number, 'errors': errors})
+            else:
+                rows.append((number, fields))
+        if strict and report['errors']:
+            return report
+
+        uploads = extract_images(archive, rows, upload_folder, options)
+
+    slides = []
+    chapter_counts = {}
+    for number, fields in rows:
+        filename = fields.get('image_filename')
+        if filename:
+            # Derived file names are fixed; the variants of new images arrive with their job
+            fields['thumbnail_filename'] = f"thumb_{filename}"
+            if filename not in uploads:
+                fields['image_variants'] = json.dumps(stored_result(upload_folder, filename, options)['variants'])
+        if 'order' not in fields:
+            # After the chapter's last slide, computed inside the INSERT; each row
+            # is flushed on its own, so it sees the rows imported before it, and
+            # the chapter rows are locked first so concurrent adds see them too
+            fields['order'] = (db.select(db.func.coalesce(db.func.max(Slide.order), 0) + 1)
+                               .where(Slide.chapter_id == fields['chapter_id']).scalar_subquery())
+
+        slide = Slide(**{key: value for key, value in fields.items() if key != 'sections'})
+        slide.set_dynamic_sections(fields['sections'])
+        slides.append((number, slide))
+        chapter_counts[slide.chapter_id] = chapter_counts.get(slide.chapter_id, 0) + 1
+
+    report['errors'].sort(key=lambda error: error['row'])
+    if not slides:
+        return report
+
+    try:
+        # Lock in id order, so two imports touching the same chapters cannot deadlock
+        db.session.execute(db.select(Chapter.id).where(Chapter.id.in_(sorted(chapter_counts)))
+                           .order_by(Chapter.id).with_for_update()).all()
+        for _, slide in slides:
+            db.session.add(slide)
+            db.session.flush()
+        content_versions.bump('slides', *[f'chapter-{chapter}' for chapter in chapter_counts])
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.exception('Slide import failed')
+        report['errors'] += [{'row': number, 'errors': [f'not saved: {e}']} for number, _ in slides]
+        return report
+
+    for _, slide in slides:
+        slide_search.index(slide)
+    report.update(imported=len(slides), slide_ids=[slide.id for _, slide in slides], chapters=chapter_counts)
+
+    # Queued only now, so a job finishing straight away finds its slides
+    report['job_ids'] = [image_jobs.submit('upload', payload, user_id=user_id) for payload in uploads.values()]
+    return report
+
+
+@image_jobs.add_done_hook
+def attach_image_variants(conn, kind, result):
+    """Give slides imported before their image was processed its responsive copies"""
+    if kind != 'upload':
+        return
+    table = Slide.__table__
+    waiting = (table.c.image_filename == result['filename']) & table.c.image_variants.is_(None)
+    slides = conn.execute(db.select(table.c.id, table.c.chapter_id).where(waiting)).all()
+    if not slides:
+        return
+    conn.execute(db.update(table).where(waiting)
+                 .values(image_variants=json.dumps(result['variants']), updated_at=datetime.utcnow()))
+    content_versions.bump('slides', *{f'chapter-{chapter_id}' for _, chapter_id in slides},
+                          *[f'slide-{slide_id}' for slide_id, _ in slides], conn=conn)
@@ -0,0 +1,139 @@
+"""Per-connection SQLite pragmas for running under several gunicorn workers.
+
+The default rollback journal lets a single writer lock out every reader,
+so a view-counter flush in one worker shows up as ``database is locked``
+in another.  :class:`SQLiteTuning` applies a named pragma profile
+(``SQLITE_PROFILE``, overridable key by key with ``SQLITE_PRAGMAS``) to
+every new connection; the ``production`` profile switches to WAL so reads
+carry on while a write is committing.
+
+:func:`run_benchmark` drives a scratch database from several processes at
+once to compare profiles; it is exposed as ``flask sqlite-bench``.
+"""
+import logging
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from sqlalchemy import create_engine, event, text
+
+logger = logging.getLogger(__name__)
+
+PROFILES = {
+    # SQLite's own defaults (rollback journal, synchronous=FULL)
+    'default': {},
+    'production': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,  # ms a writer waits for the lock before failing
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,  # negative = KiB, i.e. 64 MiB per connection
+        'temp_store': 'MEMORY',
+    },
+}
+
+
+def profile_pragmas(profile, overrides=None):
+    if profile not in PROFILES:
+        raise ValueError(f'Unknown SQLITE_PROFILE: {profile}')
+    pragmas = dict(PROFILES[profile])
+    pragmas.update(overrides or {})
+    return pragmas
+
+
+def apply_pragmas(engine, pragmas):
+    """Run ``PRAGMA key = value`` for ``pragmas`` on every new connection of ``engine``."""
+    if not pragmas:
+        return
+
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for key, value in pragmas.items():
+                cursor.execute(f'PRAGMA {key} = {value}')
+        finally:
+            cursor.close()
+
+    event.listen(engine, 'connect', set_pragmas)
+
+
+class SQLiteTuning:
+    def __init__(self, app=None, db=None):
+        self.pragmas = {}
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        app.config.setdefault('SQLITE_PROFILE', 'production')
+        app.config.setdefault('SQLITE_PRAGMAS', {})
+        self.pragmas = profile_pragmas(app.config['SQLITE_PROFILE'], app.config['SQLITE_PRAGMAS'])
+        with app.app_context():
+            engine = db.engine
+        if engine.dialect.name == 'sqlite':
+            apply_pragmas(engine, self.pragmas)
+        app.extensions['sqlite_tuning'] = self
+
+    def current(self, conn):
+        """Pragma values as the database reports them on ``conn``."""
+        return {key: conn.exec_driver_sql(f'PRAGMA {key}').scalar() for key in self.pragmas}
+
+
+def _bench_worker(path, pragmas, role, seconds, seed):
+    # Runs in a child process with its own engine, like a gunicorn worker
+    engine = create_engine(f'sqlite:///{path}')
+    apply_pragmas(engine, pragmas)
+    rng = random.Random(seed)
+    done = errors = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        item_id = rng.randint(1, 1000)
+        try:
+            if role == 'write':
+                with engine.begin() as conn:
+                    conn.execute(text('UPDATE item SET view_count = view_count + 1 WHERE id = :id'),
+                                 {'id': item_id})
+            else:
+                with engine.connect() as conn:
+                    conn.execute(text('SELECT body FROM item WHERE id = :id'), {'id': item_id}).all()
+                    conn.execute(text('SELECT sum(view_count) FROM item')).scalar()
+            done += 1
+        except Exception as e:
+            if 'locked' not in str(e):
+                raise
+            errors += 1
+    engine.dispose()
+    return role, done, errors
+
+
+def run_benchmark(pragmas, readers=4, writers=2, seconds=5.0):
+    """Hammer a scratch database from ``readers`` + ``writers`` processes.
+
+    Returns ``{'reads': n, 'writes': n, 'locked': n, 'seconds': s}``.
+    """
+    fd, path = tempfile.mkstemp(prefix='sqlite-bench-', suffix='.db')
+    os.close(fd)
+    try:
+        conn = sqlite3.connect(path)
+        conn.execute('CREATE TABLE item (id INTEGER PRIMARY KEY, view_count INTEGER NOT NULL, body TEXT)')
+        conn.executemany('INSERT INTO item VALUES (?, 0, ?)', [(i, 'x' * 500) for i in range(1, 1001)])
+        conn.commit()
+        conn.close()
+
+        roles = ['read'] * readers + ['write'] * writers
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(len(roles)) as pool:
+            results = pool.starmap(_bench_worker, [(path, pragmas, role, seconds, seed)
+                                                   for seed, role in enumerate(roles)])
+    finally:
+        for suffix in ('', '-wal', '-shm', '-journal'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    totals = {'reads': 0, 'writes': 0, 'locked': 0, 'seconds': seconds}
+    for role, done, errors in results:
+        totals['reads' if role == 'read' else 'writes'] += done
+        totals['locked'] += errors
+    return totals
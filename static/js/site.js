@@ -1 +1,157 @@
-console.log("Biology site loaded");
+// Registers the service worker (static/js/sw.js, served at /sw.js) and runs
+// the "save for offline" button of chapter pages.  A saved chapter lives in
+// its own Cache Storage cache together with the bundle it was saved from;
+// each later online visit fetches the bundle again and downloads only the
+// URLs whose revision changed.  Scrolling to the end of a saved chapter
+// (an IntersectionObserver on [data-offline-prefetch]) saves the next chapter
+// as well, unless the browser asks to save data.
+(function () {
+  'use strict';
+
+  const script = document.currentScript;
+  if (!('serviceWorker' in navigator) || !('caches' in window)) {
+    return;
+  }
+  window.addEventListener('load', () => {
+    navigator.serviceWorker.register(script.dataset.serviceWorker).catch((error) => {
+      console.warn('Service worker registration failed', error);
+    });
+  });
+
+  const OFFLINE_PREFIX = 'offline-';
+  const PARALLEL_DOWNLOADS = 4;
+
+  function cacheName(bundleUrl) {
+    return OFFLINE_PREFIX + bundleUrl;
+  }
+
+  async function download(cache, url) {
+    const sameOrigin = new URL(url, location.href).origin === location.origin;
+    const response = await fetch(url, sameOrigin
+      ? {credentials: 'omit', headers: {'X-Offline-Download': '1'}}
+      : {credentials: 'omit', mode: 'no-cors'});
+    if (!(response.ok || response.type === 'opaque') || response.redirected) {
+      throw new Error(`Could not download ${url}`);
+    }
+    await cache.put(url, response);
+  }
+
+  // Bring the saved copy of a chapter up to date; returns the number of files downloaded
+  async function saveChapter(bundleUrl, onProgress) {
+    const response = await fetch(bundleUrl, {credentials: 'omit'});
+    if (!response.ok || response.redirected) {
+      throw new Error(`Could not load ${bundleUrl}`);
+    }
+    const bundle = await response.clone().json();
+    const cache = await caches.open(cacheName(bundleUrl));
+    const savedBundle = await cache.match(bundleUrl);
+    const saved = savedBundle ? await savedBundle.json() : {version: null, entries: {}};
+    if (saved.version === bundle.version) {
+      return 0;
+    }
+
+    const wanted = [];
+    for (const [url, revision] of Object.entries(bundle.entries)) {
+      if (saved.entries[url] !== revision || !(await cache.match(url, {ignoreVary: true}))) {
+        wanted.push(url);
+      }
+    }
+    let done = 0;
+    const queue = wanted.slice();
+    const worker = async () => {
+      while (queue.length) {
+        await download(cache, queue.shift());
+        done += 1;
+        onProgress(done, wanted.length);
+      }
+    };
+    await Promise.all(Array.from({length: PARALLEL_DOWNLOADS}, worker));
+
+    await Promise.all(Object.keys(saved.entries)
+      .filter((url) => !(url in bundle.entries))
+      .map((url) => cache.delete(url, {ignoreVary: true})));
+    // Saved last: an interrupted download is picked up again next time
+    await cache.put(bundleUrl, response);
+    return wanted.length;
+  }
+
+  async function isSaved(bundleUrl) {
+    if (!(await caches.has(cacheName(bundleUrl)))) {
+      return false;
+    }
+    const cache = await caches.open(cacheName(bundleUrl));
+    return Boolean(await cache.match(bundleUrl));
+  }
+
+  function setupButton(button) {
+    const bundleUrl = button.dataset.offlineBundle;
+    const label = button.querySelector('[data-offline-label]');
+    const show = (state, text) => {
+      button.dataset.state = state;
+      label.textContent = text || button.dataset[state];
+      button.title = state === 'saved' ? button.dataset.remove : '';
+      if (state === 'saved') {
+        prefetchNext();
+      }
+    };
+    const save = async () => {
+      button.disabled = true;
+      show('saving');
+      try {
+        await saveChapter(bundleUrl, (done, total) => show('saving', `${button.dataset.saving} ${done} / ${total}`));
+        show('saved');
+      } catch (error) {
+        console.warn(error);
+        show('failed');
+      }
+      button.disabled = false;
+    };
+
+    button.addEventListener('click', async () => {
+      if (button.dataset.state === 'saved') {
+        await caches.delete(cacheName(bundleUrl));
+        show('download');
+      } else {
+        await save();
+      }
+    });
+
+    const nextBundle = button.dataset.nextBundle;
+    const sentinel = document.querySelector('[data-offline-prefetch]');
+    let atEnd = false;
+    let prefetched = false;
+    const prefetchNext = async () => {
+      // Only past the last page of slides, not at the "load more" link
+      if (prefetched || !atEnd || button.dataset.state !== 'saved' || document.getElementById('loadMore')
+          || !navigator.onLine || (navigator.connection && navigator.connection.saveData)) {
+        return;
+      }
+      prefetched = true;
+      try {
+        await saveChapter(nextBundle, () => {});
+      } catch (error) {
+        console.warn(error);
+      }
+    };
+    if (nextBundle && sentinel && 'IntersectionObserver' in window) {
+      new IntersectionObserver((entries) => {
+        atEnd = entries.some((entry) => entry.isIntersecting);
+        prefetchNext();
+      }).observe(sentinel);
+    }
+
+    isSaved(bundleUrl).then((saved) => {
+      button.hidden = false;
+      if (!saved) {
+        show('download');
+      } else if (navigator.onLine) {
+        // Refresh in the background so the offline copy follows the site
+        save();
+      } else {
+        show('saved');
+      }
+    });
+  }
+
+  document.querySelectorAll('[data-offline-bundle]').forEach(setupButton);
+})();
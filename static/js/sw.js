@@ -0,0 +1,89 @@
+// Service worker: serves saved chapters when the network is unavailable.
+// site.js fills one "offline-..." cache per saved chapter from the bundle
+// that /api/<lang>/chapter/<id>/offline.json lists; this worker only reads
+// them, plus a runtime cache for the cross-origin icon font files.
+const OFFLINE_PREFIX = 'offline-';
+const RUNTIME_CACHE = 'runtime-v1';
+const MATCH_OPTIONS = {ignoreVary: true};
+
+self.addEventListener('install', () => self.skipWaiting());
+
+self.addEventListener('activate', (event) => {
+  event.waitUntil((async () => {
+    const names = await caches.keys();
+    await Promise.all(names
+      .filter((name) => !name.startsWith(OFFLINE_PREFIX) && name !== RUNTIME_CACHE)
+      .map((name) => caches.delete(name)));
+    await self.clients.claim();
+  })());
+});
+
+self.addEventListener('fetch', (event) => {
+  const request = event.request;
+  if (request.method !== 'GET') {
+    return;
+  }
+  const url = new URL(request.url);
+  if (url.origin !== self.location.origin) {
+    if (request.destination === 'style' || request.destination === 'font') {
+      event.respondWith(cacheFirst(request, true));
+    }
+    return;
+  }
+  if (url.pathname.startsWith('/api/')) {
+    return;
+  }
+  if (request.mode === 'navigate') {
+    event.respondWith(networkFirst(request));
+  } else if (url.pathname.startsWith('/static/') || url.pathname.startsWith('/uploads/')) {
+    event.respondWith(cacheFirst(request, false));
+  }
+});
+
+async function networkFirst(request) {
+  try {
+    return await fetch(request);
+  } catch (error) {
+    const saved = await caches.match(request, MATCH_OPTIONS);
+    if (saved) {
+      return saved;
+    }
+    return new Response(
+      '<!DOCTYPE html><meta charset="utf-8"><meta name="viewport" content="width=device-width">' +
+      '<title>Offline</title><p style="font-family:sans-serif;padding:2rem">' +
+      'This page has not been saved for offline reading.</p>',
+      {status: 503, headers: {'Content-Type': 'text/html; charset=utf-8'}});
+  }
+}
+
+// Static files and uploads have content-derived URLs, so a saved copy is never stale
+async function cacheFirst(request, keep) {
+  const saved = await caches.match(request, MATCH_OPTIONS);
+  if (saved) {
+    return saved;
+  }
+  try {
+    const response = await fetch(request);
+    if (keep && (response.ok || response.type === 'opaque')) {
+      const cache = await caches.open(RUNTIME_CACHE);
+      await cache.put(request, response.clone());
+    }
+    return response;
+  } catch (error) {
+    return (await fallback(request)) || Response.error();
+  }
+}
+
+// Offline, a srcset width that was not saved falls back to the full image and
+// a file saved under an older ?v= fingerprint is better than nothing
+async function fallback(request) {
+  const url = new URL(request.url);
+  const fullImage = url.pathname.replace(/_w\d+(\.\w+)$/, '$1');
+  if (fullImage !== url.pathname) {
+    const saved = await caches.match(fullImage, MATCH_OPTIONS);
+    if (saved) {
+      return saved;
+    }
+  }
+  return caches.match(request, {ignoreVary: true, ignoreSearch: true});
+}
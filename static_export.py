@@ -0,0 +1,219 @@
+"""Static copy of the public site that nginx can serve without the app.
+
+``flask export-static`` requests every public page from the app itself
+(anonymous test-client requests, so the HTML is exactly what visitors get)
+and writes it to ``<output>/<url>/index.html``, then mirrors the static
+files and uploads next to the pages.  The service worker and the offline
+chapter bundles are written under their own names.
+
+A manifest in the output directory keeps a stamp per page, built from the
+content versions (content_version.py) of what the page shows plus a digest
+of the templates, translations and static files.  Timestamps are not used:
+views and other bookkeeping must not make a page look edited.  Later runs only render pages whose stamp
+changed and delete pages that no longer exist.  Every page carries the
+chapter menu, so editing a chapter re-renders the whole site.  Editing a
+slide re-renders its chapter and that chapter's slide pages, which list
+their siblings.
+"""
+import hashlib
+import json
+import os
+import shutil
+
+from flask import url_for
+
+from models import SLIDE_ORDER, Chapter, ContentVersion, Slide
+from pagination import page_cursors
+
+MANIFEST_NAME = '.export-manifest.json'
+
+
+def _digest(*parts):
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+
+def _tree_files(root, skip=None):
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if os.path.join(dirpath, d) != skip)
+        for name in sorted(filenames):
+            yield os.path.join(dirpath, name)
+
+
+def _site_files(app):
+    """``(root, path)`` of the templates, translations and static files (uploads excluded)"""
+    for root, skip in ((os.path.join(app.root_path, app.template_folder), None),
+                       (app.config['I18N_CATALOG_DIR'], None),
+                       (app.static_folder, os.path.abspath(app.config['UPLOAD_FOLDER']))):
+        for path in _tree_files(root, skip):
+            yield root, path
+
+
+def files_digest(app):
+    """Digest of the templates, translations and static files (uploads excluded)"""
+    digest = hashlib.sha1()
+    for root, path in _site_files(app):
+        digest.update(os.path.relpath(path, root).encode('utf-8'))
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest
+
+
+def files_mtime(app):
+    """Newest modification time of the files :func:`files_digest` covers"""
+    return max((os.path.getmtime(path) for _, path in _site_files(app)), default=0)
+
+
+def site_digest(app, versions):
+    """Digest of everything every page depends on: code-side files and the chapter list"""
+    digest = files_digest(app)
+    digest.update(str(versions.get('chapters', 0)).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def page_stamps(app, db, languages, guide_sections):
+    """``{url: stamp}`` for every public page, including the later pages of
+    long chapters and the slide API pages the chapter page loads them from"""
+    versions = dict(db.session.execute(db.select(ContentVersion.scope, ContentVersion.version)).all())
+    site = site_digest(app, versions)
+    all_slides = versions.get('slides', 0)
+    chapter_ids = db.session.execute(db.select(Chapter.id).filter_by(is_active=True)).scalars().all()
+    slides = db.session.execute(
+        db.select(Slide.id, Slide.chapter_id, Slide.order).filter_by(is_active=True)
+        .order_by(Slide.chapter_id, *SLIDE_ORDER)
+    ).all()
+    cursors = {chapter_id: page_cursors([row for row in slides if row.chapter_id == chapter_id],
+                                        SLIDE_ORDER, app.config['SLIDES_PER_PAGE'])
+               for chapter_id in chapter_ids}
+
+    stamps = {}
+    with app.test_request_context():
+        stamps[url_for('public.root')] = site
+        stamps[url_for('public.service_worker')] = site
+        for lang in languages:
+            stamps[url_for('public.index', lang=lang)] = _digest(site, all_slides)
+            stamps[url_for('public.chapters', lang=lang)] = _digest(site, all_slides)
+            stamps[url_for('public.guide', lang=lang)] = site
+            for section in guide_sections:
+                stamps[url_for('public.guide_section', lang=lang, section=section)] = site
+            for chapter_id in chapter_ids:
+                chapter_stamp = _digest(site, versions.get(f'chapter-{chapter_id}', 0))
+                stamps[url_for('public.chapter', lang=lang, chapter_id=chapter_id)] = chapter_stamp
+                stamps[url_for('api.chapter_offline_bundle', lang=lang, chapter_id=chapter_id)] = chapter_stamp
+                for cursor in cursors[chapter_id]:
+                    stamps[url_for('public.chapter', lang=lang, chapter_id=chapter_id, cursor=cursor)] = chapter_stamp
+                    stamps[url_for('api.chapter_slides_api', lang=lang, chapter_id=chapter_id, cursor=cursor)] = \
+                        chapter_stamp
+            for slide_id, chapter_id, _ in slides:
+                stamps[url_for('public.slide_detail', lang=lang, slide_id=slide_id)] = \
+                    _digest(site, versions.get(f'chapter-{chapter_id}', 0), versions.get(f'slide-{slide_id}', 0))
+    return stamps
+
+
+def page_path(output, url):
+    """File for ``url``: ``<url>/index.html`` for pages, the URL itself for
+    files like /sw.js (a dot in a directory-style URL such as a page cursor
+    is not an extension)"""
+    if not url.endswith('/') and os.path.splitext(url)[1]:
+        return os.path.join(output, url.strip('/'))
+    return os.path.join(output, url.strip('/'), 'index.html')
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _remove(path, output):
+    """Delete ``path`` and the directories it leaves empty, up to ``output``"""
+    if os.path.exists(path):
+        os.remove(path)
+    directory = os.path.dirname(path)
+    while directory != output and os.path.isdir(directory) and not os.listdir(directory):
+        os.rmdir(directory)
+        directory = os.path.dirname(directory)
+
+
+def mirror_tree(source, target, skip=None):
+    """Copy new or changed files from ``source`` to ``target`` and delete the ones
+    gone from ``source``; returns (copied, removed)"""
+    copied = removed = 0
+    wanted = set()
+    if os.path.isdir(source):
+        for dirpath, dirnames, filenames in os.walk(source):
+            dirnames[:] = [d for d in dirnames if os.path.join(dirpath, d) != skip]
+            for name in filenames:
+                src = os.path.join(dirpath, name)
+                dst = os.path.join(target, os.path.relpath(src, source))
+                wanted.add(dst)
+                src_stat = os.stat(src)
+                if os.path.exists(dst):
+                    dst_stat = os.stat(dst)
+                    if (dst_stat.st_size, int(dst_stat.st_mtime)) == (src_stat.st_size, int(src_stat.st_mtime)):
+                        continue
+                os.makedirs(os.path.dirname(dst), exist_ok=True)
+                shutil.copy2(src, dst + '.tmp')
+                os.replace(dst + '.tmp', dst)
+                copied += 1
+    if os.path.isdir(target):
+        for dirpath, _, filenames in os.walk(target, topdown=False):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                if path not in wanted:
+                    os.remove(path)
+                    removed += 1
+            if dirpath != target and not os.listdir(dirpath):
+                os.rmdir(dirpath)
+    return copied, removed
+
+
+def export_site(app, db, output, languages, guide_sections, full=False):
+    """Render changed pages into ``output`` and mirror static files and uploads.
+
+    Returns a dict of counts for the report.
+    """
+    output = os.path.abspath(output)
+    manifest_path = os.path.join(output, MANIFEST_NAME)
+    previous = {}
+    if not full and os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            previous = json.load(f)
+
+    stamps = page_stamps(app, db, languages, guide_sections)
+    counts = {'rendered': 0, 'unchanged': 0, 'removed': 0}
+    exported = {}
+    client = app.test_client()
+    for url, stamp in stamps.items():
+        path = page_path(output, url)
+        if previous.get(url) == stamp and os.path.exists(path):
+            exported[url] = stamp
+            counts['unchanged'] += 1
+            continue
+        response = client.get(url)
+        if response.status_code in (301, 302):
+            # Only the bare domain redirects; nginx serves this page for it
+            target = response.headers['Location']
+            body = f'<!DOCTYPE html><meta http-equiv="refresh" content="0; url={target}">'.encode('utf-8')
+        elif response.status_code == 200:
+            body = response.get_data()
+        else:
+            continue
+        _write(path, body)
+        exported[url] = stamp
+        counts['rendered'] += 1
+
+    for url in set(previous) - set(exported):
+        _remove(page_path(output, url), output)
+        counts['removed'] += 1
+
+    upload_folder = os.path.abspath(app.config['UPLOAD_FOLDER'])
+    upload_url = next(app.url_map.iter_rules('media.uploaded_file')).rule.split('<')[0]
+    counts['static_copied'], counts['static_removed'] = mirror_tree(
+        app.static_folder, os.path.join(output, app.static_url_path.strip('/')), skip=upload_folder)
+    counts['uploads_copied'], counts['uploads_removed'] = mirror_tree(
+        upload_folder, os.path.join(output, upload_url.strip('/')))
+
+    _write(manifest_path, json.dumps(exported, indent=0, sort_keys=True).encode('utf-8'))
+    return counts
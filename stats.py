@@ -0,0 +1,115 @@
+"""Activity logging, daily SystemStats rollups and per-chapter view/slide counts."""
+from datetime import datetime, timedelta
+
+from flask import request
+from flask_login import current_user
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from extensions import activity_sink, db, view_counter
+from models import Activity, Slide, SystemStats
+
+
+def log_activity(action, target_type, target_id, description=''):
+    """Log user activity (written in the background by activity_sink)"""
+    if current_user.is_authenticated:
+        activity_sink.submit({
+            'user_id': current_user.id,
+            'action': action,
+            'target_type': target_type,
+            'target_id': target_id,
+            'description': description,
+            'ip_address': request.remote_addr,
+            'user_agent': request.headers.get('User-Agent', '')[:500],
+            'created_at': datetime.utcnow()
+        })
+
+
+def add_daily_stats(conn, day, chapter_views=0, slide_views=0, active_users=None):
+    """Add view deltas (and optionally set active_users) on the SystemStats row for ``day``"""
+    table = SystemStats.__table__
+    values = {
+        'chapter_views': db.func.coalesce(table.c.chapter_views, 0) + chapter_views,
+        'slide_views': db.func.coalesce(table.c.slide_views, 0) + slide_views,
+        'total_views': db.func.coalesce(table.c.total_views, 0) + chapter_views + slide_views,
+    }
+    if active_users is not None:
+        values['active_users'] = active_users
+
+    row = {
+        'date': day,
+        'chapter_views': chapter_views,
+        'slide_views': slide_views,
+        'total_views': chapter_views + slide_views,
+        'active_users': active_users or 0,
+        'created_at': datetime.utcnow()
+    }
+
+    # Workers on different hosts may create the day's row at the same time, so
+    # let the unique date decide instead of UPDATE-then-INSERT.
+    if conn.dialect.name in ('postgresql', 'sqlite'):
+        dialect_insert = postgresql_insert if conn.dialect.name == 'postgresql' else sqlite_insert
+        conn.execute(dialect_insert(table).values(**row)
+                     .on_conflict_do_update(index_elements=[table.c.date], set_=values))
+        return
+
+    result = conn.execute(db.update(table).where(table.c.date == day).values(**values))
+    if result.rowcount == 0:
+        conn.execute(db.insert(table).values(**row))
+
+
+@view_counter.add_flush_hook
+def record_daily_views(conn, totals):
+    """Roll flushed page views into today's SystemStats row"""
+    add_daily_stats(conn, datetime.utcnow().date(),
+                    chapter_views=totals.get('chapter', 0),
+                    slide_views=totals.get('slide', 0))
+
+
+@activity_sink.add_flush_hook
+def record_daily_active_users(conn, rows):
+    """Refresh active_users for each day touched by a batch of activity rows"""
+    activity = Activity.__table__
+    for day in {row['created_at'].date() for row in rows}:
+        start = datetime.combine(day, datetime.min.time())
+        active_users = conn.execute(
+            db.select(db.func.count(db.distinct(activity.c.user_id)))
+            .where(activity.c.created_at >= start, activity.c.created_at < start + timedelta(days=1))
+        ).scalar() or 0
+        add_daily_stats(conn, day, active_users=active_users)
+
+
+def get_chapter_stats(chapter_ids=None):
+    """Slide count and summed slide views per chapter in one GROUP BY query.
+
+    Returns ``{chapter_id: (slides_count, slide_views)}``; chapters without
+    slides are absent.  ``chapter_ids=None`` covers every chapter.
+    """
+    query = db.session.query(
+        Slide.chapter_id,
+        db.func.count(Slide.id),
+        db.func.coalesce(db.func.sum(Slide.view_count), 0)
+    )
+    if chapter_ids is not None:
+        if not chapter_ids:
+            return {}
+        query = query.filter(Slide.chapter_id.in_(chapter_ids))
+    return {chapter_id: (count, views) for chapter_id, count, views in query.group_by(Slide.chapter_id)}
+
+
+def with_chapter_stats(chapters):
+    """Prime chapters with aggregated stats so get_slides_count()/get_total_views() don't query"""
+    stats = get_chapter_stats([c.id for c in chapters])
+    for chapter in chapters:
+        chapter._slide_stats = stats.get(chapter.id, (0, 0))
+    return chapters
+
+
+def enhance_chapters(chapters):
+    """Chapter rows in the {'chapter', 'slides_count', 'total_views'} shape the templates use"""
+    return [{
+        'chapter': chapter,
+        'slides_count': chapter.get_slides_count(),
+        'total_views': chapter.get_total_views(),
+        'last_updated': chapter.updated_at
+    } for chapter in with_chapter_stats(chapters)]
@@ -0,0 +1,22 @@
+import pytest
+
+from app import create_app
+from cli import create_sample_data, init_db
+from extensions import view_counter
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+        'UPLOAD_FOLDER': str(tmp_path / 'uploads'),
+        'IMAGE_JOB_WORKERS': 0,
+        'VIEW_COUNTER_FLUSH_INTERVAL': 0,
+    })
+    with app.app_context():
+        init_db()
+        create_sample_data()
+    yield app
+    # The counter outlives the app; write this test's views to its own database
+    view_counter.flush()
@@ -0,0 +1,28 @@
+from extensions import db
+from models import Chapter, Slide, User
+
+
+def sign_in(client, app, username='admin'):
+    with app.app_context():
+        user_id = db.session.execute(db.select(User.id).filter_by(username=username)).scalar_one()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+
+
+def test_add_chapter_and_slide_take_next_order(app):
+    client = app.test_client()
+    sign_in(client, app)
+    with app.app_context():
+        last_chapter = db.session.execute(db.select(db.func.max(Chapter.order))).scalar()
+
+    assert client.post('/en/admin/chapter/add', data={'title_en': 'Genetics'}).status_code == 302
+    with app.app_context():
+        chapter_id = db.session.execute(db.select(Chapter.id).filter_by(title_en='Genetics')).scalar_one()
+    for title in ('First', 'Second'):
+        assert client.post('/en/admin/slide/add', data={'chapter_id': chapter_id, 'title_en': title}).get_json()['success']
+
+    with app.app_context():
+        assert db.session.get(Chapter, chapter_id).order == last_chapter + 1
+        orders = db.session.execute(db.select(Slide.title_en, Slide.order).filter_by(chapter_id=chapter_id)
+                                    .order_by(Slide.order)).all()
+        assert [tuple(row) for row in orders] == [('First', 1), ('Second', 2)]
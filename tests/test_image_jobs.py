@@ -0,0 +1,24 @@
+import json
+from datetime import datetime, timedelta
+
+from extensions import db, image_jobs
+from models import ImageJob
+
+
+def add_job(job_id, status, age):
+    updated_at = datetime.utcnow() - age
+    db.session.add(ImageJob(id=job_id, kind='crop', status=status, payload=json.dumps({}),
+                            created_at=updated_at, updated_at=updated_at))
+    db.session.commit()
+
+
+def test_get_requeues_stale_jobs(app, monkeypatch):
+    ran = []
+    monkeypatch.setitem(image_jobs.tasks, 'crop', lambda: ran.append(1) or {})
+    with app.app_context():
+        add_job('fresh', 'running', timedelta(seconds=5))
+        add_job('stale', 'running', image_jobs.stale_after + timedelta(seconds=5))
+
+        assert image_jobs.get('fresh').status == 'running'
+        assert image_jobs.get('stale').status == 'done'
+        assert ran == [1]
@@ -0,0 +1,25 @@
+import time
+
+import offline
+
+
+def test_release_change_invalidates_validators(app, monkeypatch):
+    client = app.test_client()
+    first = client.get('/en/chapter/1')
+    etag, last_modified = first.headers['ETag'], first.headers['Last-Modified']
+    assert client.get('/en/chapter/1', headers={'If-None-Match': etag}).status_code == 304
+    assert client.get('/en/chapter/1', headers={'If-Modified-Since': last_modified}).status_code == 304
+
+    # A deploy: different templates, written after the page was served
+    monkeypatch.setitem(offline._release, 'digest', 'next-release')
+    monkeypatch.setitem(offline._release, 'mtime', time.time() + 60)
+    assert client.get('/en/chapter/1', headers={'If-None-Match': etag}).status_code == 200
+    assert client.get('/en/chapter/1', headers={'If-Modified-Since': last_modified}).status_code == 200
+
+
+def test_unknown_language_is_not_cached(app):
+    client = app.test_client()
+    assert client.get('/en/chapters').headers['X-Page-Cache'] == 'MISS'
+    assert client.get('/en/chapters').headers['X-Page-Cache'] == 'HIT'
+    for code in ('xx', 'yy'):
+        assert 'X-Page-Cache' not in client.get(f'/{code}/chapters').headers
@@ -0,0 +1,44 @@
+from cli import count_page_statements, hot_pages
+from extensions import db
+from models import Activity, Chapter, Slide, User
+
+
+def add_rows(chapters, slides_per_chapter, activities):
+    """More chapters, slides with sections and bullets, and activity rows"""
+    last = db.session.execute(db.select(db.func.max(Chapter.order))).scalar()
+    for number in range(chapters):
+        db.session.add(Chapter(title_en=f'Chapter {number}', title_ckb=f'بەش {number}', order=last + number + 1))
+    db.session.flush()
+    for chapter_id in db.session.execute(db.select(Chapter.id)).scalars().all():
+        last = db.session.execute(db.select(db.func.coalesce(db.func.max(Slide.order), 0))
+                                  .where(Slide.chapter_id == chapter_id)).scalar()
+        for number in range(slides_per_chapter):
+            slide = Slide(chapter_id=chapter_id, title_en=f'Slide {number}', title_ckb=f'سلاید {number}',
+                          order=last + number + 1)
+            slide.set_dynamic_sections([{'name': 'Parts', 'bullets': ['Nucleus', 'Membrane']},
+                                        {'name': 'Notes', 'bullets': ['Stained']}])
+            db.session.add(slide)
+    user_id = db.session.execute(db.select(User.id)).scalars().first()
+    for number in range(activities):
+        db.session.add(Activity(user_id=user_id, action='view', target_type='slide', target_id=number + 1))
+    db.session.commit()
+
+
+def measure():
+    return {name: (status, len(statements), budget)
+            for name, _, status, statements, budget in count_page_statements(hot_pages())}
+
+
+def test_hot_pages_fit_budget_at_any_size(app):
+    with app.app_context():
+        add_rows(chapters=1, slides_per_chapter=3, activities=5)
+        first = measure()
+        assert set(first) == {'home', 'chapters', 'chapter', 'slide', 'admin dashboard'}
+        for name, (status, count, budget) in first.items():
+            assert status == 200, name
+            assert count <= budget, name
+
+        # Per-process lookups are warm now; compare warm counts at two sizes
+        small = measure()
+        add_rows(chapters=5, slides_per_chapter=20, activities=50)
+        assert measure() == small
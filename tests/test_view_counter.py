@@ -0,0 +1,22 @@
+from extensions import db, view_counter
+from models import Chapter, Slide
+
+
+def test_flush_keeps_updated_at(app):
+    with app.app_context():
+        slide = Slide(chapter_id=1, title_en='Cell', title_ckb='خانە', order=1)
+        db.session.add(slide)
+        db.session.commit()
+        before = {'chapter': db.session.get(Chapter, 1).updated_at, 'slide': slide.updated_at}
+        slide_id = slide.id
+
+    client = app.test_client()
+    client.get('/en/chapter/1')
+    client.get(f'/en/slide/{slide_id}')
+    assert view_counter.flush() == 2
+
+    with app.app_context():
+        chapter, slide = db.session.get(Chapter, 1), db.session.get(Slide, slide_id)
+        assert (chapter.view_count, slide.view_count) == (1, 1)
+        assert chapter.updated_at == before['chapter']
+        assert slide.updated_at == before['slide']
@@ -0,0 +1,149 @@
+"""Write-behind buffer for chapter/slide view counters.
+
+Public page views call ``view_counter.increment('chapter', id)`` instead of
+bumping ``view_count`` and committing inside the request.  Hits are
+aggregated per (kind, id) in memory and written back with one batched
+``UPDATE ... SET view_count = view_count + n`` per model, either on a timer,
+once enough hits are pending, or when the process exits.
+"""
+import atexit
+import logging
+import os
+import threading
+from collections import Counter
+
+from sqlalchemy import bindparam, update
+
+logger = logging.getLogger(__name__)
+
+
+class ViewCounterBuffer:
+    """Aggregate view increments in-process and flush them in batches.
+
+    Every gunicorn worker keeps its own buffer, so the database sees at most
+    one write per model per worker per flush interval instead of one write
+    per page view.
+    """
+
+    def __init__(self, app=None, db=None, models=None):
+        self.app = None
+        self.db = None
+        self.models = {}
+        self.enabled = True
+        self.interval = 10.0
+        self.threshold = 500
+        self._lock = threading.Lock()
+        self._pending = Counter()
+        self._pending_total = 0
+        self._thread = None
+        self._stop = threading.Event()
+        self._pid = None
+        self._flush_hooks = []
+        if app is not None:
+            self.init_app(app, db, models)
+
+    def init_app(self, app, db, models):
+        app.config.setdefault('VIEW_COUNTER_ENABLED', True)
+        app.config.setdefault('VIEW_COUNTER_FLUSH_INTERVAL', 10.0)
+        app.config.setdefault('VIEW_COUNTER_FLUSH_THRESHOLD', 500)
+        self.app = app
+        self.db = db
+        self.models = dict(models)
+        self.enabled = app.config['VIEW_COUNTER_ENABLED']
+        self.interval = float(app.config['VIEW_COUNTER_FLUSH_INTERVAL'])
+        self.threshold = int(app.config['VIEW_COUNTER_FLUSH_THRESHOLD'])
+        app.extensions['view_counter'] = self
+        atexit.register(self.shutdown)
+
+    def increment(self, kind, object_id, amount=1):
+        """Record ``amount`` views for ``kind`` (e.g. ``'chapter'``) ``object_id``."""
+        if kind not in self.models:
+            raise KeyError(f'Unknown view counter kind: {kind}')
+        if not self.enabled:
+            return
+
+        self._ensure_worker()
+        with self._lock:
+            self._pending[(kind, object_id)] += amount
+            self._pending_total += amount
+            should_flush = self._pending_total >= self.threshold
+
+        if should_flush:
+            self.flush()
+
+    def add_flush_hook(self, func):
+        """Call ``func(conn, totals)`` inside every flush transaction.
+
+        ``totals`` maps each kind to the number of views being written, so
+        hooks can maintain rollups in the same transaction as the counters.
+        """
+        self._flush_hooks.append(func)
+        return func
+
+    def pending(self, kind, object_id):
+        """Views recorded for an object that have not been written yet."""
+        with self._lock:
+            return self._pending.get((kind, object_id), 0)
+
+    def flush(self):
+        """Write all pending increments back; returns the number of views flushed."""
+        with self._lock:
+            batch = self._pending
+            self._pending = Counter()
+            self._pending_total = 0
+
+        if not batch:
+            return 0
+
+        # Rows are updated in id order so that flushes from workers on other
+        # hosts take the row locks in the same order and cannot deadlock.
+        by_kind = {}
+        for (kind, object_id), amount in sorted(batch.items()):
+            by_kind.setdefault(kind, []).append({'b_id': object_id, 'b_amount': amount})
+
+        try:
+            with self.app.app_context():
+                with self.db.engine.begin() as conn:
+                    for kind, rows in by_kind.items():
+                        table = self.models[kind].__table__
+                        values = {'view_count': table.c.view_count + bindparam('b_amount')}
+                        if 'updated_at' in table.c:
+                            # A view is not an edit: keep the onupdate hook away from updated_at
+                            values['updated_at'] = table.c.updated_at
+                        stmt = update(table).where(table.c.id == bindparam('b_id')).values(**values)
+                        conn.execute(stmt, rows)
+                    totals = {kind: sum(row['b_amount'] for row in rows) for kind, rows in by_kind.items()}
+                    for hook in self._flush_hooks:
+                        hook(conn, totals)
+        except Exception:
+            logger.exception('Failed to flush view counters, keeping them for the next attempt')
+            with self._lock:
+                self._pending.update(batch)
+                self._pending_total += sum(batch.values())
+            return 0
+
+        return sum(batch.values())
+
+    def shutdown(self):
+        """Stop the flush thread and write whatever is still pending."""
+        self._stop.set()
+        self.flush()
+
+    def _ensure_worker(self):
+        # Started lazily and per-pid so that a preloading gunicorn master
+        # does not hand its (dead after fork) thread to the workers.
+        if self.interval <= 0:
+            return
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, name='view-counter-flush', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()